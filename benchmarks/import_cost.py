@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Measure the cost of importing django_cas_binder modules.
+
+Every module is imported in a fresh interpreter (after Django is set up), so
+the numbers reflect what a freshly forked worker pays. Run with --check to
+fail when a heavy dependency is pulled in at import time, or when an import
+exceeds the given time/memory budget.
+
+    ./benchmarks/import_cost.py
+    ./benchmarks/import_cost.py --check --max-ms 150 --max-rss-kb 20000
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+MODULES = [
+    'django_cas_binder.auth_backends',
+    'django_cas_binder.oic_rest_auth',
+]
+
+# Dependencies that must only be loaded on first use.
+LAZY_DEPENDENCIES = ['oic', 'requests']
+
+PROBE = """
+import json, resource, sys, time
+from django_cas_binder.setup_django import setup_django
+setup_django()
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.time()
+__import__(%(module)r)
+elapsed = time.time() - started
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'ms': elapsed * 1000,
+    'rss_kb': rss_after - rss_before,
+    'loaded': [m for m in %(lazy)r if m in sys.modules],
+}))
+"""
+
+
+def measure(module, repeat):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', PROBE % {
+                'module': module, 'lazy': LAZY_DEPENDENCIES}],
+            cwd=root)
+        results.append(json.loads(output.decode('utf-8')))
+    return {
+        'ms': min(r['ms'] for r in results),
+        'rss_kb': min(r['rss_kb'] for r in results),
+        'loaded': results[0]['loaded'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--max-ms', type=float, default=None)
+    parser.add_argument('--max-rss-kb', type=int, default=None)
+    args = parser.parse_args()
+
+    failures = []
+    for module in MODULES:
+        result = measure(module, args.repeat)
+        print('%-36s %8.1f ms %8d kB  eager: %s' % (
+            module, result['ms'], result['rss_kb'],
+            ', '.join(result['loaded']) or '-'))
+        if result['loaded']:
+            failures.append('%s imports %s eagerly' % (
+                module, ', '.join(result['loaded'])))
+        if args.max_ms is not None and result['ms'] > args.max_ms:
+            failures.append('%s took %.1f ms' % (module, result['ms']))
+        if args.max_rss_kb is not None and \
+                result['rss_kb'] > args.max_rss_kb:
+            failures.append('%s used %d kB' % (module, result['rss_kb']))
+
+    if args.check and failures:
+        for failure in failures:
+            print('FAIL: ' + failure, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Compare the XML and JSON ticket validation paths of CASBinderBackend.
+
+Measures, separately, the cost of parsing a serviceValidate response (python-
+cas XML parsing vs ticket_validation.parse_json_response) and of a full
+validation round trip against the load test's fake CAS server (a python-cas
+client per login vs the pooled JSON validator).
+
+    ./benchmarks/ticket_validation.py --rounds 2000 --latency 0.001
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django_cas_binder.setup_django import setup_django  # NOQA
+
+
+def report(name, xml_seconds, json_seconds, rounds):
+    print('%-12s xml %8.1f us  json %8.1f us  (%.1fx)' % (
+        name,
+        xml_seconds / rounds * 1e6,
+        json_seconds / rounds * 1e6,
+        xml_seconds / json_seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--parse-rounds', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    setup_django(CAS_SERVER_URL='http://127.0.0.1/', CAS_VERSION='3')
+
+    from cas import CASClientV3
+    from django_cas_ng.utils import get_cas_client
+    from django_cas_binder import loadtest
+    from django_cas_binder.ticket_validation import (
+        parse_json_response, verify_ticket_json
+    )
+
+    xml = (loadtest.SUCCESS_XML % {
+        'universal_id': 'fake_uid', 'username': 'fake_username',
+    }).encode('utf-8')
+    json_body = loadtest.success_json(
+        'fake_uid', 'fake_username').encode('utf-8')
+    assert CASClientV3.parse_response_xml(xml) == \
+        parse_json_response(json_body)
+    report(
+        'parse',
+        timeit.timeit(
+            lambda: CASClientV3.parse_response_xml(xml),
+            number=args.parse_rounds),
+        timeit.timeit(
+            lambda: parse_json_response(json_body),
+            number=args.parse_rounds),
+        args.parse_rounds)
+
+    server = loadtest.FakeCASServer(latency=args.latency)
+    server.start()
+    try:
+        ticket = loadtest.make_ticket('fake_uid', 'fake_username')
+
+        def validate_xml():
+            client = get_cas_client(service_url=loadtest.SERVICE_URL)
+            client.server_url = server.url
+            return client.verify_ticket(ticket)
+
+        def validate_json():
+            return verify_ticket_json(
+                server.url, ticket, loadtest.SERVICE_URL)
+
+        assert validate_xml()[0] == validate_json()[0] == 'fake_uid'
+        report(
+            'round trip',
+            timeit.timeit(validate_xml, number=args.rounds),
+            timeit.timeit(validate_json, number=args.rounds),
+            args.rounds)
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
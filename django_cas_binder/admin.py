@@ -1,7 +1,5 @@
 import csv
 
-import requests
-from django.conf import settings
 from django.http import HttpResponse
 from django.contrib import admin, messages
 from django.contrib.auth import get_user_model
@@ -9,38 +7,12 @@ from django.contrib.auth.admin import UserAdmin
 from django.db import transaction
 from django.core.exceptions import SuspiciousOperation
 
+from django_cas_binder.cas_api import (  # NOQA
+    MAX_ERRORS_TO_SHOW, UniversalIdsApiError, fetch_universal_ids_from_cas
+)
 from django_cas_binder.models import CASUser
 
 
-class UniversalIdsApiError(Exception):
-    def __init__(self, messages):
-        self.messages = messages
-
-
-MAX_ERRORS_TO_SHOW = 7
-
-
-def fetch_universal_ids_from_cas(emails):
-    r = requests.post(
-        settings.CAS_SERVER_URL + 'api/universal_ids/',
-        json={'emails': emails})
-    if r.status_code == 200:
-        return r.json()['universal_ids']
-    else:
-        messages = []
-        for error in r.json()['errors'][:MAX_ERRORS_TO_SHOW]:
-            if error.get('error_code') == 'no_such_user':
-                messages.append('%s - %s' % (
-                    error['email'], error['error_message']
-                ))
-            else:
-                messages.append(error['error_message'])
-        more_errors = r.json()['errors'][MAX_ERRORS_TO_SHOW:]
-        if more_errors:
-            messages.append('%d other errors occurred' % len(more_errors))
-        raise UniversalIdsApiError(messages)
-
-
 class CasAwareUserAdmin(UserAdmin):
     actions = UserAdmin.actions + ['export_users', 'enable_cas_login']
 
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class CASBinderConfig(AppConfig):
+    name = 'django_cas_binder'
+
+    def ready(self):
+        from django.contrib.auth import signals
+        from django_cas_binder import session_index
+        from django_cas_binder.permission_cache import connect_signals
+
+        connect_signals()
+        signals.user_logged_in.connect(session_index.user_logged_in)
+        signals.user_logged_out.connect(session_index.user_logged_out)
@@ -0,0 +1,80 @@
+"""Batched application of user attribute changes pushed by CAS."""
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from django_cas_binder.auth_backends import CASBinderBackend
+from django_cas_binder.models import CASUser
+
+
+def apply_attribute_changes(events):
+    """Apply a batch of events, each a dict with 'universal_id', 'version'
+    and 'attributes' keys. Versions must increase with every change of a
+    universal id's attributes: events no newer than the last version applied
+    to a user (replayed or late ones) are skipped, and the others are merged
+    in version order. Only attributes listed in
+    CAS_BINDER_UPDATE_USER_ATTRIBUTES that actually changed are written, with
+    a single bulk_update. Return a tuple of the number of users updated, the
+    list of unknown universal ids and the list of universal ids with stale
+    events only.
+    """
+    events_by_id = OrderedDict()
+    for event in sorted(events, key=lambda event: event['version']):
+        events_by_id.setdefault(event['universal_id'], []).append(event)
+    if not events_by_id:
+        return 0, [], []
+
+    backend = CASBinderBackend()
+    update_attributes = getattr(
+        settings, 'CAS_BINDER_UPDATE_USER_ATTRIBUTES', [])
+    with transaction.atomic():
+        cas_users = list(CASUser.objects
+                         .filter(universal_id__in=list(events_by_id))
+                         .select_related('user')
+                         .select_for_update()
+                         .order_by('pk'))
+
+        updated, fields, claimed_usernames = [], set(), set()
+        versioned, stale = [], set()
+        for cas_user in cas_users:
+            user = cas_user.user
+            attributes = {}
+            for event in events_by_id[cas_user.universal_id]:
+                if cas_user.attributes_version is None or \
+                        event['version'] > cas_user.attributes_version:
+                    attributes.update(event['attributes'])
+                    cas_user.attributes_version = event['version']
+            if not attributes:
+                stale.add(cas_user.universal_id)
+                continue
+            versioned.append(cas_user)
+
+            if 'username' in attributes and 'username' in update_attributes:
+                attributes['username'] = backend.clean_username(
+                    user.username, attributes['username'], claimed_usernames)
+                if attributes['username'] != user.username:
+                    claimed_usernames.add(attributes['username'])
+            changes = backend.get_changed_attributes(user, attributes)
+            if changes:
+                for attr, value in changes.items():
+                    setattr(user, attr, value)
+                updated.append(user)
+                fields.update(changes)
+
+        if updated:
+            get_user_model()._default_manager.bulk_update(
+                updated, sorted(fields), batch_size=500)
+        if versioned:
+            CASUser.objects.bulk_update(
+                versioned, ['attributes_version'], batch_size=500)
+
+    known = set(cas_user.universal_id for cas_user in cas_users)
+    return len(updated), [
+        universal_id for universal_id in events_by_id
+        if universal_id not in known
+    ], [
+        universal_id for universal_id in events_by_id
+        if universal_id in stale
+    ]
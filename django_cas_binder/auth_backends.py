@@ -11,10 +11,18 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
 from django.db import transaction
 from django_cas_ng.signals import cas_user_authenticated
-from django_cas_ng.utils import get_cas_client
 
+from django_cas_binder.db import (
+    get_cas_user, pin_to_primary, read_with_fallback
+)
+from django_cas_binder import permission_cache, session_index
+from django_cas_binder.deferred_updates import defer_attribute_update
+from django_cas_binder.endpoints import cas_server_call
 from django_cas_binder.models import CASUser
-from django_cas_binder.utils import get_free_username
+from django_cas_binder.signal_dispatch import get_signal_dispatcher
+from django_cas_binder.signals import cas_user_authenticated_sync
+from django_cas_binder.ticket_validation import verify_ticket_json
+from django_cas_binder.utils import compact_attributes, get_free_username
 from django_cas_binder.create_user_and_casuser import create_user_and_casuser
 
 
@@ -30,10 +38,10 @@ class CASBinderBackend(ModelBackend):
     def __init__(self):
         self.user_model = get_user_model()
 
-    def clean_username(self, current_username, new_username):
+    def clean_username(self, current_username, new_username, reserved=()):
         def is_username_free(username):
-            return not self.user_model.objects.filter(
-                username=username).exists()
+            return username not in reserved and \
+                not self.user_model.objects.filter(username=username).exists()
 
         if current_username is not None and current_username == new_username:
             return current_username
@@ -41,30 +49,84 @@ class CASBinderBackend(ModelBackend):
             return get_free_username(
                 new_username, is_username_free, USERNAME_TRIES_LIMIT)
 
-    @transaction.atomic
-    def update_user_attributes(self, user, attributes):
+    def get_changed_attributes(self, user, attributes):
         update_attributes = getattr(
             settings, 'CAS_BINDER_UPDATE_USER_ATTRIBUTES', [])
-        for attr in update_attributes:
-            if attr in attributes:
-                setattr(user, attr, attributes[attr])
-        user.save()
+        return dict(
+            (attr, attributes[attr]) for attr in update_attributes
+            if attr in attributes and getattr(user, attr) != attributes[attr]
+        )
+
+    def update_user_attributes(self, user, attributes):
+        """Update the user with changed attributes. The user is only saved
+        if something changed; with CAS_BINDER_DEFERRED_ATTRIBUTE_UPDATES the
+        save is deferred until the current transaction commits, and only the
+        instance is updated right away."""
+        changes = self.get_changed_attributes(user, attributes)
+        if not changes:
+            return
+        for attr, value in changes.items():
+            setattr(user, attr, value)
+        deferred = getattr(
+            settings, 'CAS_BINDER_DEFERRED_ATTRIBUTE_UPDATES', None)
+        if deferred:
+            defer_attribute_update(user.pk, changes, deferred)
+        else:
+            with transaction.atomic():
+                user.save(update_fields=list(changes))
+
+    def store_in_session(self, request, key, value):
+        """Store `value` under `key` in the session, marking the session as
+        modified only if the stored value actually changes."""
+        if request.session.get(key) != value:
+            request.session[key] = value
+
+    def store_session_attributes(self, request, attributes):
+        names = getattr(settings, 'CAS_BINDER_SESSION_ATTRIBUTES', None)
+        max_size = getattr(
+            settings, 'CAS_BINDER_SESSION_ATTRIBUTES_MAX_SIZE', None)
+        if names is not None or max_size is not None:
+            attributes = compact_attributes(attributes, names, max_size)
+        else:
+            # a copy, authenticate goes on to clean the username
+            attributes = dict(attributes)
+        self.store_in_session(request, 'attributes', attributes)
+
+    def verify_ticket(self, server_url, ticket, service, client=None):
+        """Validate `ticket` with the CAS server at `server_url` and return
+        (universal_id, attributes, pgtiou), either through the python-cas
+        `client` or, if there is none, with a JSON serviceValidate request.
+        """
+        if client is None:
+            return verify_ticket_json(server_url, ticket, service)
+        client.server_url = server_url
+        return client.verify_ticket(ticket)
 
     def authenticate(self, ticket, service, request=None):
         """Verifies CAS ticket and gets or creates user object"""
-        client = get_cas_client(service_url=service)
-        universal_id, attributes, pgtiou = client.verify_ticket(ticket)
+        client = None
+        if not getattr(settings, 'CAS_BINDER_JSON_TICKET_VALIDATION', False):
+            # imported lazily, python-cas pulls in requests
+            from django_cas_ng.utils import get_cas_client
+
+            client = get_cas_client(service_url=service)
+        universal_id, attributes, pgtiou = cas_server_call(
+            lambda server_url: self.verify_ticket(
+                server_url, ticket, service, client),
+            idempotent=False)
 
         if attributes and request:
-            request.session['attributes'] = attributes
+            self.store_session_attributes(request, attributes)
         if not universal_id:
             return None
 
         try:
-            user = CASUser.objects.get(universal_id=universal_id).user
-            attributes['username'] = self.clean_username(
-                user.username, attributes['username'])
-            self.update_user_attributes(user, attributes)
+            user = get_cas_user(universal_id=universal_id).user
+            if getattr(
+                    settings, 'CAS_BINDER_UPDATE_ATTRIBUTES_ON_LOGIN', True):
+                attributes['username'] = self.clean_username(
+                    user.username, attributes['username'])
+                self.update_user_attributes(user, attributes)
             created = False
         except CASUser.DoesNotExist:
             # check if we want to create new users, if we don't fail auth
@@ -83,11 +145,16 @@ class CASBinderBackend(ModelBackend):
         if not self.user_can_authenticate(user):
             return None
 
+        if request is not None:
+            # picked up by session_index once the session key is final
+            setattr(request, session_index.UNIVERSAL_ID_ATTRIBUTE,
+                    universal_id)
+
         if pgtiou and settings.CAS_PROXY_CALLBACK and request:
-            request.session['pgtiou'] = pgtiou
+            self.store_in_session(request, 'pgtiou', pgtiou)
 
         # send the `cas_user_authenticated` signal
-        cas_user_authenticated.send(
+        signal_kwargs = dict(
             sender=self,
             user=user,
             created=created,
@@ -95,15 +162,39 @@ class CASBinderBackend(ModelBackend):
             ticket=ticket,
             service=service,
         )
+        cas_user_authenticated_sync.send(**signal_kwargs)
+        if getattr(settings, 'CAS_BINDER_ASYNC_SIGNAL_DISPATCH', False):
+            # receivers run on other connections, so they must only see the
+            # user once the login's transaction has committed
+            transaction.on_commit(lambda: get_signal_dispatcher().send(
+                cas_user_authenticated, **signal_kwargs))
+        else:
+            cas_user_authenticated.send(**signal_kwargs)
         return user
 
+    def get_all_permissions(self, user_obj, obj=None):
+        """With CAS_BINDER_PERMISSION_CACHE_TIMEOUT set, get the permissions
+        from a cache shared across requests and processes."""
+        if obj is not None or user_obj.pk is None or \
+                not user_obj.is_active or not permission_cache.is_enabled():
+            return super(CASBinderBackend, self).get_all_permissions(
+                user_obj, obj)
+        if not hasattr(user_obj, '_perm_cache'):
+            user_obj._perm_cache = permission_cache.get_permissions(
+                user_obj.pk,
+                lambda: super(CASBinderBackend, self).get_all_permissions(
+                    user_obj))
+        return user_obj._perm_cache
+
     def get_user(self, user_id):
         """Retrieve the user's entry in the user model if it exists"""
 
-        try:
-            return self.user_model.objects.get(pk=user_id)
-        except self.user_model.DoesNotExist:
-            return None
+        user = read_with_fallback(
+            lambda alias: self.user_model.objects.using(alias)
+            .filter(pk=user_id).first())
+        if user is not None:
+            pin_to_primary(user)
+        return user
 
     def user_can_authenticate(self, user):
         """Added for compatibility with older Django versions (1.9), which
@@ -0,0 +1,47 @@
+from django_cas_binder.endpoints import cas_server_call
+
+
+class UniversalIdsApiError(Exception):
+    def __init__(self, messages):
+        self.messages = messages
+
+
+MAX_ERRORS_TO_SHOW = 7
+
+
+def post_universal_ids(emails):
+    """Ask CAS for the universal ids of users with given emails. Return a
+    tuple (universal_ids, errors): the {email: universal_id} mapping and None
+    if CAS succeeded, None and the list of errors otherwise. Raise
+    UniversalIdsApiError if the response can't be understood.
+    """
+    import requests
+
+    r = cas_server_call(lambda server_url: requests.post(
+        server_url + 'api/universal_ids/', json={'emails': emails}))
+    try:
+        if r.status_code == 200:
+            return r.json()['universal_ids'], None
+        return None, r.json()['errors']
+    except (ValueError, KeyError, TypeError):
+        raise UniversalIdsApiError(
+            ['CAS returned: %s %s' % (r.status_code, r.text[:50])])
+
+
+def fetch_universal_ids_from_cas(emails):
+    universal_ids, errors = post_universal_ids(emails)
+    if errors is None:
+        return universal_ids
+    else:
+        messages = []
+        for error in errors[:MAX_ERRORS_TO_SHOW]:
+            if error.get('error_code') == 'no_such_user':
+                messages.append('%s - %s' % (
+                    error['email'], error['error_message']
+                ))
+            else:
+                messages.append(error['error_message'])
+        more_errors = errors[MAX_ERRORS_TO_SHOW:]
+        if more_errors:
+            messages.append('%d other errors occurred' % len(more_errors))
+        raise UniversalIdsApiError(messages)
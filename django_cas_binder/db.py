@@ -0,0 +1,87 @@
+"""Routing of authentication reads to a read replica.
+
+With CAS_BINDER_READ_DATABASE set to a database alias, CASUser and user
+lookups on the authentication paths are sent to that database first. On a
+miss, e.g. because of replication lag right after a user was provisioned,
+they are repeated against the database the default routing picks. Instances
+read from the replica are pinned to the write database, so saving them later
+(for instance to update last_login) never writes to the replica.
+"""
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import router
+
+from django_cas_binder.models import CASUser
+
+
+def get_read_database():
+    return getattr(settings, 'CAS_BINDER_READ_DATABASE', None)
+
+
+def pin_to_primary(*instances):
+    for instance in instances:
+        instance._state.db = router.db_for_write(type(instance))
+
+
+def read_with_fallback(lookup):
+    """Return lookup(alias) for the read database, or lookup(None) (default
+    routing) if the read database is not configured or the lookup misses,
+    i.e. returns None or raises ObjectDoesNotExist.
+    """
+    alias = get_read_database()
+    if alias is not None:
+        try:
+            result = lookup(alias)
+        except ObjectDoesNotExist:
+            result = None
+        if result is not None:
+            return result
+    return lookup(None)
+
+
+def get_cas_user(**lookup):
+    """Get a CASUser, with its user, from the read database if configured.
+    Raise CASUser.DoesNotExist if it doesn't exist."""
+    cas_user = read_with_fallback(
+        lambda alias: CASUser.objects.using(alias)
+        .select_related('user').get(**lookup))
+    pin_to_primary(cas_user, cas_user.user)
+    return cas_user
+
+
+def first_cas_user(**lookup):
+    """Like get_cas_user, but return the first matching CASUser or None."""
+    cas_user = read_with_fallback(
+        lambda alias: CASUser.objects.using(alias)
+        .select_related('user').filter(**lookup).first())
+    if cas_user is not None:
+        pin_to_primary(cas_user, cas_user.user)
+    return cas_user
+
+
+def cas_users_by_universal_id(universal_ids):
+    """Map universal ids to CASUsers (with users) in one query per
+    database. Ids missing from the read database are looked up again with
+    default routing. Where a universal id is mapped more than once, the
+    lowest pk wins, as with first_cas_user.
+    """
+    def lookup(alias, universal_ids):
+        found = {}
+        for cas_user in CASUser.objects.using(alias) \
+                .filter(universal_id__in=universal_ids) \
+                .select_related('user') \
+                .order_by('-pk'):
+            found[cas_user.universal_id] = cas_user
+        return found
+
+    universal_ids = set(universal_ids)
+    found = {}
+    alias = get_read_database()
+    if alias is not None and universal_ids:
+        found = lookup(alias, universal_ids)
+        universal_ids -= set(found)
+    if universal_ids:
+        found.update(lookup(None, universal_ids))
+    for cas_user in found.values():
+        pin_to_primary(cas_user, cas_user.user)
+    return found
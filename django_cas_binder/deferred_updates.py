@@ -0,0 +1,112 @@
+"""Write-behind user attribute updates.
+
+With CAS_BINDER_DEFERRED_ATTRIBUTE_UPDATES set, CASBinderBackend defers
+attribute changes instead of saving the user during authentication. Nothing
+is written before the transaction in which the changes were made commits
+(with ATOMIC_REQUESTS, the request's transaction; in autocommit mode this is
+immediate), and nothing at all if it rolls back. Changes are then either
+applied right away ('on_commit') or queued, coalesced per user, for a
+background flusher thread running every CAS_BINDER_DEFERRED_FLUSH_INTERVAL
+seconds ('thread'). The queue lives in process memory: changes still pending
+when a process is killed are lost, and will be queued again on the user's
+next login.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+class AttributeUpdateQueue(object):
+    def __init__(self):
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, user_pk, changes):
+        with self.lock:
+            self.pending.setdefault(user_pk, {}).update(changes)
+
+    def drain(self):
+        with self.lock:
+            pending, self.pending = self.pending, OrderedDict()
+        return pending
+
+    def flush(self):
+        """Apply all pending changes, one UPDATE per user. Return the number
+        of users updated."""
+        return sum(
+            apply_attribute_update(user_pk, changes)
+            for user_pk, changes in self.drain().items())
+
+    def __len__(self):
+        return len(self.pending)
+
+
+def apply_attribute_update(user_pk, changes):
+    """Apply the changes of one user with an UPDATE. Failures, be it of the
+    database or of bad changes (e.g. an unknown field), are logged, so that
+    one user's changes can't keep the others from being applied. Return
+    whether the update succeeded."""
+    try:
+        with transaction.atomic():
+            get_user_model()._default_manager \
+                .filter(pk=user_pk).update(**changes)
+    except Exception:
+        logger.exception(
+            'Failed to update attributes %s of user %s',
+            sorted(changes), user_pk)
+        return False
+    return True
+
+
+queue = AttributeUpdateQueue()
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def flush_attribute_updates():
+    return queue.flush()
+
+
+def _run_flusher():
+    while True:
+        time.sleep(getattr(
+            settings, 'CAS_BINDER_DEFERRED_FLUSH_INTERVAL', 1.0))
+        try:
+            flush_attribute_updates()
+        except Exception:
+            # keep the thread alive, later changes still have to be applied
+            logger.exception('Failed to flush attribute updates')
+        finally:
+            close_old_connections()
+
+
+def _start_flusher():
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_run_flusher, name='cas-binder-attribute-flusher')
+            _flusher.daemon = True
+            _flusher.start()
+            atexit.register(flush_attribute_updates)
+
+
+def defer_attribute_update(user_pk, changes, mode):
+    if mode not in ('on_commit', 'thread'):
+        raise ValueError(
+            'Unknown CAS_BINDER_DEFERRED_ATTRIBUTE_UPDATES mode: %r' % mode)
+    if mode == 'on_commit':
+        transaction.on_commit(lambda: apply_attribute_update(user_pk, changes))
+    else:
+        transaction.on_commit(lambda: queue.add(user_pk, changes))
+        _start_flusher()
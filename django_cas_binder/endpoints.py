@@ -0,0 +1,167 @@
+"""Latency-aware selection among several CAS server endpoints.
+
+CAS_BINDER_SERVER_URLS lists the base URLs of CAS replicas, which must share
+their tickets and tokens. Each call goes to the healthy endpoint with the
+lowest exponentially weighted moving average (EWMA) of latency, weighted by
+the calls it has in flight. A call failing with a transient error marks the
+endpoint down for a growing cooldown and fails over to the next healthy
+endpoint, as long as the retry budget allows it. Endpoints that are down are
+skipped, unless they all are: then the one soonest back is probed.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from django_cas_binder.retry import (
+    cas_call, get_retry_budget, is_connection_error, is_transient_error
+)
+
+
+class Endpoint(object):
+    def __init__(self, url):
+        self.url = url
+        self.latency = None
+        self.in_flight = 0
+        self.failures = 0
+        self.down_until = 0.0
+
+    def score(self):
+        # Endpoints without a measured latency come first, so that every
+        # endpoint gets probed.
+        return (self.latency or 0.0) * (self.in_flight + 1)
+
+
+class EndpointSelector(object):
+    """Track the latency and failures of endpoints and call the best one.
+
+    `decay` is the weight of the latest latency sample in the EWMA. An
+    endpoint failing `n` times in a row is down for `cooldown * 2 ** (n - 1)`
+    seconds, up to `max_cooldown`.
+    """
+
+    def __init__(self, urls, decay=0.3, cooldown=5.0, max_cooldown=60.0,
+                 clock=time.monotonic):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.decay = decay
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    def partition(self):
+        """Return healthy endpoints best first and endpoints that are down,
+        soonest back first."""
+        now = self.clock()
+        with self.lock:
+            healthy = sorted(
+                (e for e in self.endpoints if e.down_until <= now),
+                key=Endpoint.score)
+            down = sorted(
+                (e for e in self.endpoints if e.down_until > now),
+                key=lambda e: e.down_until)
+        return healthy, down
+
+    def ordered(self):
+        healthy, down = self.partition()
+        return healthy + down
+
+    def candidates(self):
+        """Return the endpoints to call, in order: the healthy ones or, if
+        all are down, the one soonest back."""
+        healthy, down = self.partition()
+        return healthy or down[:1]
+
+    def started(self, endpoint):
+        with self.lock:
+            endpoint.in_flight += 1
+
+    def succeeded(self, endpoint, latency):
+        with self.lock:
+            endpoint.in_flight -= 1
+            endpoint.failures = 0
+            endpoint.down_until = 0.0
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency = self.decay * latency + \
+                    (1 - self.decay) * endpoint.latency
+
+    def failed(self, endpoint):
+        with self.lock:
+            endpoint.in_flight -= 1
+            endpoint.failures += 1
+            endpoint.down_until = self.clock() + min(
+                self.max_cooldown,
+                self.cooldown * 2 ** (endpoint.failures - 1))
+
+    def call(self, func, should_fail_over=is_transient_error, budget=None):
+        """Call `func(url)` on the best endpoint, failing over to the next
+        candidates while it raises errors for which `should_fail_over` is
+        true. Each failover is withdrawn from the retry budget."""
+        if budget is None:
+            budget = get_retry_budget()
+        error = None
+        for i, endpoint in enumerate(self.candidates()):
+            if i and not budget.withdraw():
+                break
+            self.started(endpoint)
+            start = self.clock()
+            try:
+                result = func(endpoint.url)
+            except Exception as e:
+                if not should_fail_over(e):
+                    # CAS answered, the endpoint is healthy
+                    self.succeeded(endpoint, self.clock() - start)
+                    raise
+                self.failed(endpoint)
+                error = e
+                continue
+            self.succeeded(endpoint, self.clock() - start)
+            return result
+        raise error
+
+
+_selectors = {}
+_lock = threading.Lock()
+
+
+def get_cas_server_urls():
+    urls = getattr(settings, 'CAS_BINDER_SERVER_URLS', None)
+    if urls:
+        return list(urls)
+    url = getattr(settings, 'CAS_SERVER_URL', None)
+    return [url] if url else []
+
+
+def get_endpoint_selector():
+    urls = tuple(get_cas_server_urls())
+    with _lock:
+        if urls not in _selectors:
+            _selectors[urls] = EndpointSelector(
+                urls,
+                decay=getattr(settings, 'CAS_BINDER_ENDPOINT_EWMA_DECAY', 0.3),
+                cooldown=getattr(
+                    settings, 'CAS_BINDER_ENDPOINT_COOLDOWN', 5.0),
+            )
+        return _selectors[urls]
+
+
+def relative_to_cas_server(url):
+    """Return the part of `url` following the configured CAS server URL it
+    starts with, or None if there is none."""
+    for server_url in get_cas_server_urls():
+        if url.startswith(server_url):
+            return url[len(server_url):]
+    return None
+
+
+def cas_server_call(func, idempotent=True):
+    """Call `func(server_url)` on the best CAS endpoint, through cas_call.
+    Like retries, failover of non-idempotent calls only happens when CAS
+    couldn't be reached."""
+    selector = get_endpoint_selector()
+    should_fail_over = is_transient_error if idempotent else \
+        is_connection_error
+    return cas_call(
+        lambda: selector.call(func, should_fail_over), idempotent=idempotent)
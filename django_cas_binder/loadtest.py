@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+"""Concurrent load generator for CAS logins and access token authentication.
+
+Starts a local fake CAS server (ticket validation, OpenID discovery and
+userinfo) with configurable latency and error injection, then drives
+CASBinderBackend.authenticate and DRF requests authenticated with
+BaseOICAuthentication from a pool of threads, using a mix of:
+
+* first logins of new CAS users, whose usernames are drawn from a small pool
+  so that they collide,
+* repeat logins of existing users,
+* API requests with access tokens drawn from a small pool, so that tokens
+  repeat.
+
+It reports p50/p95/p99 latency, throughput, database queries per request
+and CAS calls per request for every kind of request.
+
+    python -m django_cas_binder.loadtest --threads 16 --requests 2000 \\
+        --latency 0.02 --error-rate 0.01 --set CAS_BINDER_RETRY_ATTEMPTS=3
+
+By default Django is configured with a throwaway SQLite database. With
+--use-django-settings the project from DJANGO_SETTINGS_MODULE (and its
+database) is used instead; users are created in it, so only point it at a
+disposable database.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+
+SERVICE_URL = 'http://loadtest.invalid/'
+
+SUCCESS_XML = (
+    '<cas:serviceResponse xmlns:cas="http://www.yale.edu/tp/cas">'
+    '<cas:authenticationSuccess>'
+    '<cas:user>%(universal_id)s</cas:user>'
+    '<cas:attributes>'
+    '<cas:email>%(username)s@loadtest.invalid</cas:email>'
+    '<cas:username>%(username)s</cas:username>'
+    '</cas:attributes>'
+    '</cas:authenticationSuccess>'
+    '</cas:serviceResponse>'
+)
+
+FAILURE_XML = (
+    '<cas:serviceResponse xmlns:cas="http://www.yale.edu/tp/cas">'
+    '<cas:authenticationFailure code="INVALID_TICKET">'
+    'Ticket not recognized'
+    '</cas:authenticationFailure>'
+    '</cas:serviceResponse>'
+)
+
+
+def success_json(universal_id, username):
+    return json.dumps({'serviceResponse': {'authenticationSuccess': {
+        'user': universal_id,
+        'attributes': {
+            'email': ['%s@loadtest.invalid' % username],
+            'username': [username],
+        },
+    }}})
+
+
+FAILURE_JSON = json.dumps({'serviceResponse': {'authenticationFailure': {
+    'code': 'INVALID_TICKET',
+    'description': 'Ticket not recognized',
+}}})
+
+
+def make_ticket(universal_id, username):
+    return 'ST-%s-%s' % (universal_id, username)
+
+
+def make_access_token(universal_id):
+    return 'AT-%s' % universal_id
+
+
+class FakeCASServer(ThreadingMixIn, HTTPServer):
+    """CAS stand-in answering serviceValidate (in XML, or in JSON with
+    format=JSON) for tickets made with make_ticket and userinfo for tokens
+    made with make_access_token.
+
+    Every response is delayed by `latency` seconds plus up to `jitter`
+    seconds, and fails with 503 with probability `error_rate`. Calls are
+    counted per path in `calls`.
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FakeCASHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = defaultdict(int)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/' % self.server_address[1]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, path):
+        with self.lock:
+            self.calls[path] += 1
+
+
+class FakeCASHandler(BaseHTTPRequestHandler):
+    # keep-alive, like a real CAS server; without Nagle's algorithm, which
+    # would delay responses written in two parts on reused connections
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status, body, content_type):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 401:
+            self.send_header('WWW-Authenticate', 'invalid_token')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+        server.count(url.path)
+        time.sleep(server.latency + random.random() * server.jitter)
+        if random.random() < server.error_rate:
+            return self.respond(503, 'unavailable', 'text/plain')
+
+        if url.path.endswith('/serviceValidate'):
+            parts = params.get('ticket', '').split('-', 2)
+            if params.get('format') == 'JSON':
+                if len(parts) != 3 or parts[0] != 'ST':
+                    return self.respond(
+                        200, FAILURE_JSON, 'application/json')
+                return self.respond(
+                    200, success_json(parts[1], parts[2]),
+                    'application/json')
+            if len(parts) != 3 or parts[0] != 'ST':
+                return self.respond(200, FAILURE_XML, 'text/xml')
+            return self.respond(200, SUCCESS_XML % {
+                'universal_id': parts[1], 'username': parts[2],
+            }, 'text/xml')
+        elif url.path == '/openid/.well-known/openid-configuration':
+            return self.respond(200, json.dumps({
+                'issuer': server.url + 'openid',
+                'userinfo_endpoint': server.url + 'openid/userinfo',
+            }), 'application/json')
+        elif url.path == '/openid/userinfo':
+            token = params.get('access_token', '')
+            if not token.startswith('AT-'):
+                return self.respond(401, '', 'text/plain')
+            return self.respond(200, json.dumps({
+                'universal_id': token[3:],
+            }), 'application/json')
+        return self.respond(404, 'not found', 'text/plain')
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[
+        int(round(p / 100.0 * (len(sorted_values) - 1)))]
+
+
+class QueryCounter(object):
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class LoadTest(object):
+    def __init__(self, mix, users, usernames, tokens, seed=None):
+        self.mix = mix
+        self.users = users
+        self.usernames = usernames
+        self.tokens = tokens
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.new_users = 0
+
+    def populate(self):
+        from django_cas_binder.create_user_and_casuser import (
+            create_user_and_casuser
+        )
+
+        for i in range(self.users):
+            create_user_and_casuser(
+                'existing%d' % i, 'existing%d@loadtest.invalid' % i,
+                'existing_%d' % i)
+
+    def next_operation(self):
+        """Pick the next request, under the lock as Random isn't shared
+        safely between threads."""
+        with self.lock:
+            kinds = sorted(self.mix)
+            kind = self.random.choices(
+                kinds, [self.mix[k] for k in kinds])[0]
+            if kind == 'first_login':
+                self.new_users += 1
+                ticket = make_ticket(
+                    'new_%d' % self.new_users,
+                    'user%d' % self.random.randrange(self.usernames))
+                return kind, ticket
+            elif kind == 'repeat_login':
+                i = self.random.randrange(self.users)
+                return kind, make_ticket('existing_%d' % i, 'existing%d' % i)
+            else:
+                i = self.random.randrange(min(self.tokens, self.users))
+                return kind, make_access_token('existing_%d' % i)
+
+    def login(self, ticket):
+        from django_cas_binder.auth_backends import CASBinderBackend
+
+        class FakeRequest(object):
+            def __init__(self):
+                self.session = {}
+
+        user = CASBinderBackend().authenticate(
+            ticket, SERVICE_URL, FakeRequest())
+        if user is None:
+            raise AssertionError('login failed')
+
+    def api_request(self, access_token):
+        from rest_framework.test import APIRequestFactory
+
+        request = APIRequestFactory().get(
+            '/', {'access_token': access_token})
+        response = self.view(request)
+        if response.status_code != 200:
+            raise AssertionError('status %d' % response.status_code)
+
+    def make_view(self):
+        from rest_framework.permissions import IsAuthenticated
+        from rest_framework.response import Response
+        from rest_framework.views import APIView
+
+        from django_cas_binder.oic_rest_auth import BaseOICAuthentication
+
+        class LoadTestView(APIView):
+            authentication_classes = (BaseOICAuthentication,)
+            permission_classes = (IsAuthenticated,)
+
+            def get(self, request):
+                return Response({'user': request.user.pk})
+        return LoadTestView.as_view()
+
+    def run_one(self):
+        from django.db import connection
+
+        kind, argument = self.next_operation()
+        counter = QueryCounter()
+        started = time.time()
+        error = None
+        try:
+            with connection.execute_wrapper(counter):
+                if kind == 'token':
+                    self.api_request(argument)
+                else:
+                    self.login(argument)
+        except Exception as e:
+            error = '%s: %s' % (type(e).__name__, str(e)[:80])
+        return kind, time.time() - started, counter.count, error
+
+    def run(self, threads, requests):
+        self.view = self.make_view()
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(
+                lambda _: self.run_one(), range(requests)))
+        return results, time.time() - started
+
+
+def report(results, elapsed, cas_calls, out=sys.stdout):
+    by_kind = defaultdict(list)
+    for result in results:
+        by_kind[result[0]].append(result)
+
+    print('%d requests in %.2f s, %.1f requests/s' % (
+        len(results), elapsed, len(results) / elapsed), file=out)
+    print('%-13s %7s %7s %9s %9s %9s %9s' % (
+        'kind', 'count', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'queries'),
+        file=out)
+    errors = defaultdict(int)
+    for kind in sorted(by_kind):
+        kind_results = by_kind[kind]
+        latencies = sorted(r[1] * 1000 for r in kind_results)
+        failed = [r for r in kind_results if r[3] is not None]
+        for r in failed:
+            errors['%s: %s' % (kind, r[3])] += 1
+        print('%-13s %7d %7d %9.1f %9.1f %9.1f %9.2f' % (
+            kind, len(kind_results), len(failed),
+            percentile(latencies, 50), percentile(latencies, 95),
+            percentile(latencies, 99),
+            float(sum(r[2] for r in kind_results)) / len(kind_results)),
+            file=out)
+
+    print('CAS calls per request:', file=out)
+    for path in sorted(cas_calls):
+        print('  %-45s %.2f' % (
+            path, float(cas_calls[path]) / len(results)), file=out)
+    if errors:
+        print('Errors:', file=out)
+        for error, count in sorted(errors.items(), key=lambda e: -e[1]):
+            print('  %5d  %s' % (count, error), file=out)
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        kind, weight = item.split('=')
+        if kind not in ('first_login', 'repeat_login', 'token'):
+            raise argparse.ArgumentTypeError('unknown kind %r' % kind)
+        mix[kind] = float(weight)
+    return mix
+
+
+def parse_setting(value):
+    name, _, raw = value.partition('=')
+    try:
+        return name, json.loads(raw)
+    except ValueError:
+        return name, raw
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument(
+        '--mix', type=parse_mix,
+        default=parse_mix('first_login=0.2,repeat_login=0.4,token=0.4'),
+        help='Weights of request kinds (default: %(default)s).')
+    parser.add_argument(
+        '--users', type=int, default=200,
+        help='Existing users created before the run.')
+    parser.add_argument(
+        '--usernames', type=int, default=20,
+        help='Size of the username pool of first logins.')
+    parser.add_argument(
+        '--tokens', type=int, default=50,
+        help='Size of the access token pool.')
+    parser.add_argument(
+        '--latency', type=float, default=0.01,
+        help='Fake CAS response latency in seconds.')
+    parser.add_argument(
+        '--jitter', type=float, default=0.0,
+        help='Random extra fake CAS latency, up to this many seconds.')
+    parser.add_argument(
+        '--error-rate', type=float, default=0.0,
+        help='Fraction of fake CAS responses failing with 503.')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument(
+        '--set', type=parse_setting, action='append', default=[],
+        metavar='NAME=VALUE',
+        help='Override a Django setting, VALUE is parsed as JSON if valid.')
+    parser.add_argument(
+        '--use-django-settings', action='store_true',
+        help='Use DJANGO_SETTINGS_MODULE instead of a throwaway database.')
+    args = parser.parse_args(argv)
+
+    server = FakeCASServer(args.latency, args.jitter, args.error_rate)
+    server.start()
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    overrides = dict(args.set)
+    overrides.update(CAS_SERVER_URL=server.url, CAS_CREATE_USER=True)
+    if args.use_django_settings:
+        django.setup()
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+    else:
+        from django_cas_binder.setup_django import setup_django
+
+        database = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        overrides['DATABASES'] = {'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': database.name,
+            'OPTIONS': {'timeout': 30},
+        }}
+        setup_django(**overrides)
+        call_command('migrate', verbosity=0)
+
+    load_test = LoadTest(
+        args.mix, args.users, args.usernames, args.tokens, args.seed)
+    load_test.populate()
+    server.calls.clear()
+    try:
+        results, elapsed = load_test.run(args.threads, args.requests)
+    finally:
+        server.stop()
+    report(results, elapsed, server.calls)
+
+
+if __name__ == '__main__':
+    main()
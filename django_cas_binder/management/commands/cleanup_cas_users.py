@@ -0,0 +1,190 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from django_cas_binder.cas_api import UniversalIdsApiError, post_universal_ids
+from django_cas_binder.models import CASUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Find stale CASUser mappings. CASUser rows are scanned in primary '
+        'key order, in batches, and the emails of their users are looked up '
+        'in CAS with one call per batch. Duplicate mappings of a universal '
+        'id are deleted (the one whose user logged in most recently is '
+        'kept). Rows whose email CAS does not know (orphaned) or maps to '
+        'another universal id (mismatched), and users inactive for '
+        '--inactive-days, are only reported: local emails may be out of '
+        'date. Orphaned rows are deleted with --delete-orphaned.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report what would be deleted.')
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Rows per batch, CAS call and transaction.')
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help='Seconds to sleep between batches.')
+        parser.add_argument(
+            '--delete-orphaned', action='store_true',
+            help='Delete rows whose email CAS does not know. Only use it if '
+                 'local emails are kept in sync with CAS.')
+        parser.add_argument(
+            '--skip-cas-check', action='store_true',
+            help='Do not look up emails in CAS.')
+        parser.add_argument(
+            '--inactive-days', type=int, default=None,
+            help='Report users that have not logged in for this many days.')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.sleep = options['sleep']
+        if self.batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        inactive_since = None
+        if options['inactive_days'] is not None:
+            inactive_since = timezone.now() - timedelta(
+                days=options['inactive_days'])
+
+        counts = dict.fromkeys(
+            ['scanned', 'orphaned', 'mismatched', 'inactive', 'duplicate'], 0)
+        for batch in self.batches():
+            counts['scanned'] += len(batch)
+            if inactive_since is not None:
+                for cas_user in batch:
+                    last_login = cas_user.user.last_login
+                    if last_login is None or last_login < inactive_since:
+                        counts['inactive'] += 1
+                        self.report('inactive', cas_user)
+            if not options['skip_cas_check']:
+                orphaned, mismatched = self.check_in_cas(batch)
+                counts['orphaned'] += len(orphaned)
+                counts['mismatched'] += len(mismatched)
+                for cas_user in mismatched:
+                    self.report('mismatched', cas_user)
+                if options['delete_orphaned']:
+                    self.delete('orphaned', orphaned)
+                else:
+                    for cas_user in orphaned:
+                        self.report('orphaned', cas_user)
+            self.throttle()
+
+        for duplicates in self.duplicate_batches():
+            counts['duplicate'] += len(duplicates)
+            self.delete('duplicate', duplicates)
+            self.throttle()
+
+        self.stdout.write(
+            '%(scanned)d scanned, %(orphaned)d orphaned, %(duplicate)d '
+            'duplicate, %(mismatched)d mismatched, %(inactive)d inactive'
+            % counts + (' (dry run)' if self.dry_run else ''))
+
+    def batches(self):
+        """Yield CASUser rows in batches, paginating on the primary key."""
+        queryset = CASUser.objects.select_related('user').order_by('pk')
+        last_pk = None
+        while True:
+            if last_pk is None:
+                batch = list(queryset[:self.batch_size])
+            else:
+                batch = list(
+                    queryset.filter(pk__gt=last_pk)[:self.batch_size])
+            if not batch:
+                return
+            yield batch
+            last_pk = batch[-1].pk
+
+    def check_in_cas(self, batch):
+        """Return CASUser rows whose email CAS doesn't know and rows whose
+        email CAS maps to a different universal id."""
+        by_email = {}
+        for cas_user in batch:
+            if cas_user.user.email:
+                by_email.setdefault(cas_user.user.email, []).append(cas_user)
+        emails = sorted(by_email)
+        if not emails:
+            return [], []
+
+        universal_ids, errors = self.post_universal_ids(emails)
+        unknown = set()
+        if errors is not None:
+            unknown = set(
+                error['email'] for error in errors
+                if error.get('error_code') == 'no_such_user')
+            other_errors = [
+                error for error in errors
+                if error.get('error_code') != 'no_such_user']
+            if other_errors:
+                raise CommandError('CAS returned: %s' % '; '.join(
+                    error['error_message'] for error in other_errors))
+            known = [email for email in emails if email not in unknown]
+            universal_ids = {}
+            if known:
+                universal_ids, errors = self.post_universal_ids(known)
+                if errors is not None:
+                    raise CommandError('CAS returned: %s' % '; '.join(
+                        error['error_message'] for error in errors))
+
+        orphaned, mismatched = [], []
+        for email in emails:
+            for cas_user in by_email[email]:
+                if email in unknown:
+                    orphaned.append(cas_user)
+                elif universal_ids.get(email) != cas_user.universal_id:
+                    mismatched.append(cas_user)
+        return orphaned, mismatched
+
+    def post_universal_ids(self, emails):
+        try:
+            return post_universal_ids(emails)
+        except UniversalIdsApiError as e:
+            raise CommandError('; '.join(e.messages))
+
+    def duplicate_batches(self):
+        """Yield batches of CASUser rows sharing a universal id with a row
+        whose user logged in more recently (or, if equal, has a lower pk)."""
+        universal_ids = list(
+            CASUser.objects
+            .values_list('universal_id', flat=True)
+            .annotate(mappings=Count('pk'))
+            .filter(mappings__gt=1)
+            .order_by('universal_id'))
+        for i in range(0, len(universal_ids), self.batch_size):
+            chunk = universal_ids[i:i + self.batch_size]
+            duplicates, seen = [], set()
+            for cas_user in CASUser.objects \
+                    .filter(universal_id__in=chunk) \
+                    .select_related('user') \
+                    .order_by(
+                        'universal_id',
+                        F('user__last_login').desc(nulls_last=True),
+                        'pk'):
+                if cas_user.universal_id in seen:
+                    duplicates.append(cas_user)
+                seen.add(cas_user.universal_id)
+            yield duplicates
+
+    def delete(self, reason, cas_users):
+        for cas_user in cas_users:
+            self.report(reason, cas_user)
+        if cas_users and not self.dry_run:
+            with transaction.atomic():
+                CASUser.objects.filter(
+                    pk__in=[cas_user.pk for cas_user in cas_users]).delete()
+
+    def report(self, reason, cas_user):
+        self.stdout.write('%s: user %s (%s), universal id %s' % (
+            reason, cas_user.pk, cas_user.user.email, cas_user.universal_id))
+
+    def throttle(self):
+        if self.sleep:
+            time.sleep(self.sleep)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_cas_binder.session_index import (
+    evict_sessions, prune_session_index
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete all sessions of given universal ids, as recorded by the '
+        'session index (CAS_BINDER_SESSION_INDEX). With --prune, also remove '
+        'index entries of expired sessions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('universal_ids', nargs='*')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Remove index entries of sessions that expired.')
+
+    def handle(self, *args, **options):
+        if not options['universal_ids'] and not options['prune']:
+            raise CommandError('Give universal ids to evict or --prune.')
+        if options['universal_ids']:
+            self.stdout.write('%d sessions evicted' % evict_sessions(
+                options['universal_ids']))
+        if options['prune']:
+            self.stdout.write('%d index entries pruned' % (
+                prune_session_index()))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_cas_binder', '0002_cassession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casuser',
+            name='attributes_version',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -9,3 +9,17 @@ class CASUser(models.Model):
         primary_key=True,
     )
     universal_id = models.CharField(max_length=100)
+    # version of the last attribute sync event applied, see attribute_sync
+    attributes_version = models.BigIntegerField(null=True, blank=True)
+
+
+class CASSession(models.Model):
+    """Index of sessions created by CAS logins, used to find all sessions of
+    a universal id without scanning the session store."""
+    session_key = models.CharField(max_length=40, primary_key=True)
+    universal_id = models.CharField(max_length=100, db_index=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    expire_date = models.DateTimeField(db_index=True)
@@ -1,20 +1,104 @@
 import json
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 from django.conf import settings
-from django_cas_binder.models import CASUser
-from oic.oic import Client
-from oic.utils.authn.client import CLIENT_AUTHN_METHOD
+from django_cas_binder.db import cas_users_by_universal_id, first_cas_user
+from django_cas_binder.endpoints import (
+    cas_server_call, relative_to_cas_server
+)
+from django_cas_binder.retry import cas_call
+from django_cas_binder.throttling import allow_token_auth_attempt
 
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.permissions import BasePermission
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, Throttled
 
 
 class CASResponseError(Exception):
     pass
 
 
+class CASServerError(CASResponseError):
+    """CAS responded with a server error; the call may be retried."""
+    transient = True
+
+
+MEMO_ATTRIBUTE = '_cas_binder_oic_authentication'
+
+USER_NOT_FOUND_MESSAGE = (
+    'user not found, login to the site with the browser and try again')
+
+
+def get_userinfo_endpoint():
+    """Discover the OpenID provider in CAS and return its userinfo endpoint.
+    """
+    # oic (with its crypto stack) is imported lazily, so that merely
+    # importing this module stays cheap in processes that never authenticate
+    # with an access token.
+    from oic.oic import Client
+    from oic.utils.authn.client import CLIENT_AUTHN_METHOD
+
+    c = Client(client_authn_method=CLIENT_AUTHN_METHOD, verify_ssl=False)
+    http_request = c.http_request
+
+    def checked_http_request(url, *args, **kwargs):
+        # oic turns error responses into a CommunicationError that doesn't
+        # tell server errors, which may be retried, from the others
+        r = http_request(url, *args, **kwargs)
+        if r.status_code != 200:
+            raise cas_response_error(r)
+        return r
+    c.http_request = checked_http_request
+
+    cas_server_call(lambda server_url: c.provider_config(server_url + 'openid'))
+    return c._endpoint('userinfo_endpoint')
+
+
+def cas_response_error(r):
+    """Return the exception to raise for an unexpected CAS response."""
+    error_class = CASServerError if r.status_code >= 500 else CASResponseError
+    return error_class("CAS returned: {} {} {}".format(
+        str(r.status_code),
+        str(r.text)[:50],
+        str(r.headers)[:20],
+    ))
+
+
+def fetch_userinfo(userinfo_endpoint, access_token):
+    """Validate `access_token` against the CAS userinfo endpoint and return
+    the json payload. Raise AuthenticationFailed if the token is rejected and
+    CASResponseError if there is some problem with CAS.
+    """
+    # the endpoint is called on whichever CAS replica is fastest
+    path = relative_to_cas_server(userinfo_endpoint)
+    if path is None:
+        return cas_call(
+            lambda: _fetch_userinfo(userinfo_endpoint, access_token))
+    return cas_server_call(
+        lambda server_url: _fetch_userinfo(server_url + path, access_token))
+
+
+def _fetch_userinfo(userinfo_endpoint, access_token):
+    import requests
+
+    r = requests.get(userinfo_endpoint, params={'access_token': access_token})
+    if r.status_code == 200:
+        try:
+            resp = json.loads(r.text)
+        except ValueError:
+            raise CASResponseError(
+                'cas response is not json: {}'.format(r.text[:50]))
+        if not isinstance(resp, dict) or resp.get('universal_id') is None:
+            raise CASResponseError('cas response contains no universal_id')
+        return resp
+    elif r.status_code in (401, 403):
+        msg = r.headers['WWW-Authenticate']
+        raise AuthenticationFailed({"detail": msg})
+    else:
+        raise cas_response_error(r)
+
+
 class BaseOICAuthentication(BaseAuthentication):
     def authenticate(self, request):
         """Take a request with an 'access_token' query parameter and attempt to
@@ -24,41 +108,96 @@ class BaseOICAuthentication(BaseAuthentication):
         dictionary containing 'universal_id' key and {claim_name: True} for each
         scope claim owned by the user. Raise a CASResponseError exception if
         there is some problem with CAS. If access_token is invalid or (local)
-        user instance is not found, raise AuthenticationFailed.
+        user instance is not found, raise AuthenticationFailed. If the client
+        exceeds CAS_BINDER_TOKEN_AUTH_RATE, raise Throttled without calling
+        CAS.
         """
         access_token = request.query_params.get('access_token')
         if not access_token:
             return None
-        c = Client(client_authn_method=CLIENT_AUTHN_METHOD, verify_ssl=False)
-        c.provider_config(settings.CAS_SERVER_URL + 'openid')
-        r = requests.get(c._endpoint('userinfo_endpoint'),
-                         params={'access_token': access_token})
-        if r.status_code == 200:
-            resp = json.loads(r.text)
-            universal_id = resp.get('universal_id')
-            if universal_id is None:
-                raise CASResponseError(
-                    'cas response contains no universal_id')
-            cas_user = CASUser.objects.filter(universal_id=universal_id).first()
-            if cas_user is None:
-                # FIXME
-                raise AuthenticationFailed(
-                    'user not found, login to the site with the browser '
-                    'and try again'
-                )
-            return (cas_user.user, resp)
-        elif r.status_code in (401, 403):
-            msg = r.headers['WWW-Authenticate']
-            raise AuthenticationFailed({"detail": msg})
+        # The outcome is memoized on the underlying HttpRequest, so that any
+        # number of OIC authentication classes validate the token only once
+        # per request.
+        http_request = getattr(request, '_request', request)
+        memo = getattr(http_request, MEMO_ATTRIBUTE, None)
+        if memo is None or memo[0] != access_token:
+            try:
+                memo = (access_token,
+                        self.validate_access_token(request, access_token),
+                        None)
+            except (AuthenticationFailed, Throttled, CASResponseError) as e:
+                memo = (access_token, None, e)
+            setattr(http_request, MEMO_ATTRIBUTE, memo)
+        if memo[2] is not None:
+            raise memo[2]
+        return memo[1]
+
+    def validate_access_token(self, request, access_token):
+        allowed, wait = allow_token_auth_attempt(request, access_token)
+        if not allowed:
+            raise Throttled(wait)
+        resp = fetch_userinfo(get_userinfo_endpoint(), access_token)
+        cas_user = first_cas_user(universal_id=resp['universal_id'])
+        if cas_user is None:
+            # FIXME
+            raise AuthenticationFailed(USER_NOT_FOUND_MESSAGE)
+        return (cas_user.user, resp)
+
+
+TokenValidationResult = namedtuple(
+    'TokenValidationResult', ['user', 'payload', 'error'])
+
+
+def validate_access_tokens(access_tokens, max_workers=None):
+    """Validate many access tokens at once.
+
+    Tokens are deduplicated, validated concurrently against the CAS userinfo
+    endpoint (discovered only once) and their universal ids are resolved to
+    users with a single query. Return a dict mapping every distinct token to
+    a TokenValidationResult; `error` is None on success, otherwise it is the
+    AuthenticationFailed or CASResponseError that a single authentication
+    would have raised, and `user` is None.
+    """
+    import requests
+
+    tokens = list(OrderedDict.fromkeys(t for t in access_tokens if t))
+    if not tokens:
+        return {}
+    if max_workers is None:
+        max_workers = getattr(
+            settings, 'CAS_BINDER_TOKEN_VALIDATION_WORKERS', 8)
+
+    userinfo_endpoint = get_userinfo_endpoint()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tokens))) \
+            as executor:
+        futures = [
+            (token, executor.submit(fetch_userinfo, userinfo_endpoint, token))
+            for token in tokens
+        ]
+
+    payloads, results = {}, {}
+    for token, future in futures:
+        try:
+            payloads[token] = future.result()
+        except (AuthenticationFailed, CASResponseError) as e:
+            results[token] = TokenValidationResult(None, None, e)
+        except requests.RequestException as e:
+            results[token] = TokenValidationResult(
+                None, None, CASResponseError(str(e)))
+
+    cas_users = cas_users_by_universal_id(
+        p['universal_id'] for p in payloads.values())
+    users = dict((universal_id, cas_user.user)
+                 for universal_id, cas_user in cas_users.items())
+
+    for token, payload in payloads.items():
+        user = users.get(payload['universal_id'])
+        if user is None:
+            results[token] = TokenValidationResult(
+                None, payload, AuthenticationFailed(USER_NOT_FOUND_MESSAGE))
         else:
-            response_text = r.text
-            response_status_code = r.status_code
-            response_headers = r.headers
-            raise CASResponseError("CAS returned: {} {} {}".format(
-                str(response_status_code),
-                str(response_text)[:50],
-                str(response_headers)[:20],
-            ))
+            results[token] = TokenValidationResult(user, payload, None)
+    return results
 
 
 def make_oic_authentication_class(*claim_names):
@@ -0,0 +1,53 @@
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from django_cas_binder.oic_rest_auth import validate_access_tokens
+
+
+class AccessTokenValidationView(APIView):
+    """Validate a batch of access tokens posted as
+    {"access_tokens": [...]}. Respond with {"results": [...]} holding, in
+    request order, {"universal_id", "user_id", "payload"} for valid tokens
+    and {"error"} for the rejected ones.
+
+    Only admin users may use it by default; gateways will usually want to
+    override `authentication_classes` and `permission_classes`.
+    """
+    permission_classes = (IsAdminUser,)
+    max_tokens = 100
+
+    def post(self, request):
+        access_tokens = request.data.get('access_tokens')
+        if not isinstance(access_tokens, list) or not all(
+                isinstance(t, str) for t in access_tokens):
+            raise ValidationError(
+                {'access_tokens': 'Expected a list of strings.'})
+        if len(access_tokens) > self.max_tokens:
+            raise ValidationError({'access_tokens': (
+                'At most %d tokens can be validated at once.'
+                % self.max_tokens)})
+
+        results = validate_access_tokens(access_tokens)
+        data = []
+        for token in access_tokens:
+            result = results.get(token)
+            if result is None:
+                data.append({'error': 'empty access token'})
+            elif result.error is not None:
+                error = result.error
+                if isinstance(error, AuthenticationFailed):
+                    detail = error.detail
+                    if isinstance(detail, dict):
+                        detail = detail.get('detail')
+                    data.append({'error': str(detail)})
+                else:
+                    data.append({'error': str(error)})
+            else:
+                data.append({
+                    'universal_id': result.payload['universal_id'],
+                    'user_id': result.user.pk,
+                    'payload': result.payload,
+                })
+        return Response({'results': data})
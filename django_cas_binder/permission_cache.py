@@ -0,0 +1,112 @@
+"""Shared permission cache for CASBinderBackend.
+
+With CAS_BINDER_PERMISSION_CACHE_TIMEOUT set, the permissions computed by
+ModelBackend.get_all_permissions are stored in a Django cache (the one named
+by CAS_BINDER_PERMISSION_CACHE), keyed by user id, so they are shared across
+requests and processes. Entries are invalidated by signals: changes to a
+user (including its groups and permissions) bump a version number of that
+user, changes to groups, group permissions or permissions bump a generation
+number shared by all entries. Both are part of the key, and are read before
+computing the permissions, so that permissions computed while they are being
+changed are stored under a key that is never read again.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+
+GENERATION_KEY = 'cas_binder:perms:generation'
+
+
+def is_enabled():
+    return getattr(
+        settings, 'CAS_BINDER_PERMISSION_CACHE_TIMEOUT', None) is not None
+
+
+def get_cache():
+    return caches[getattr(settings, 'CAS_BINDER_PERMISSION_CACHE', 'default')]
+
+
+def get_generation(cache):
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def make_version_key(user_pk):
+    return 'cas_binder:perms:version:%s' % user_pk
+
+
+def make_key(user_pk, generation, version):
+    return 'cas_binder:perms:%s:%s:%s' % (generation, user_pk, version)
+
+
+def get_permissions(user_pk, compute):
+    """Return the cached permissions of a user, calling compute() and
+    caching its result on a miss."""
+    cache = get_cache()
+    key = make_key(
+        user_pk, get_generation(cache),
+        cache.get(make_version_key(user_pk), 0))
+    permissions = cache.get(key)
+    if permissions is None:
+        permissions = compute()
+        cache.set(key, permissions, getattr(
+            settings, 'CAS_BINDER_PERMISSION_CACHE_TIMEOUT'))
+    return permissions
+
+
+def invalidate_user(user_pk):
+    cache = get_cache()
+    key = make_version_key(user_pk)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_all():
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+def user_changed(sender, instance, **kwargs):
+    if is_enabled():
+        invalidate_user(instance.pk)
+
+
+def user_relation_changed(sender, instance, action, reverse, **kwargs):
+    if is_enabled() and action.startswith('post_'):
+        if reverse:
+            # e.g. users added to a group from the group's side
+            invalidate_all()
+        else:
+            invalidate_user(instance.pk)
+
+
+def permissions_changed(sender, **kwargs):
+    if is_enabled():
+        invalidate_all()
+
+
+def connect_signals():
+    user_model = get_user_model()
+    post_save.connect(user_changed, sender=user_model)
+    post_delete.connect(user_changed, sender=user_model)
+    for field in ('groups', 'user_permissions'):
+        if hasattr(user_model, field):
+            m2m_changed.connect(
+                user_relation_changed,
+                sender=getattr(user_model, field).through)
+    m2m_changed.connect(permissions_changed, sender=Group.permissions.through)
+    for model in (Group, Permission):
+        post_save.connect(permissions_changed, sender=model)
+        post_delete.connect(permissions_changed, sender=model)
@@ -0,0 +1,165 @@
+"""Retries with jittered exponential backoff and hedged requests for CAS calls.
+
+Both are disabled by default. Retries and hedged requests draw from a shared
+budget that only grows with regular calls, so during a CAS outage they add a
+bounded fraction of extra load instead of multiplying it.
+"""
+import random
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+)
+
+from django.conf import settings
+
+
+class RetryBudget(object):
+    """Token bucket allowing retries and hedged requests for at most `ratio`
+    of regular calls, plus an initial allowance of `min_tokens`.
+    """
+
+    def __init__(self, ratio, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(min_tokens)
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+_budget = None
+_hedge_executor = None
+_lock = threading.Lock()
+
+
+def get_retry_budget():
+    global _budget
+    with _lock:
+        if _budget is None:
+            _budget = RetryBudget(
+                getattr(settings, 'CAS_BINDER_RETRY_BUDGET_RATIO', 0.1))
+        return _budget
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    with _lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=getattr(
+                settings, 'CAS_BINDER_HEDGE_WORKERS', 16))
+        return _hedge_executor
+
+
+def is_connection_error(e):
+    """True for connection errors, after which CAS most likely hasn't
+    processed the request."""
+    import requests
+
+    return isinstance(e, requests.ConnectionError)
+
+
+def is_transient_error(e):
+    """True for connection errors, timeouts and errors marked transient,
+    such as 5xx responses from CAS.
+    """
+    import requests
+
+    return isinstance(e, (requests.ConnectionError, requests.Timeout)) or \
+        getattr(e, 'transient', False)
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Full jitter: a random delay up to the exponential backoff cap."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def call_with_retry(func, is_transient=is_transient_error, attempts=None,
+                    budget=None, sleep=time.sleep):
+    """Call `func`, retrying up to `attempts` times in total while it raises
+    errors for which `is_transient` is true and the budget allows it.
+    """
+    if attempts is None:
+        attempts = getattr(settings, 'CAS_BINDER_RETRY_ATTEMPTS', 1)
+    if budget is None:
+        budget = get_retry_budget()
+    base_delay = getattr(settings, 'CAS_BINDER_RETRY_BASE_DELAY', 0.05)
+    max_delay = getattr(settings, 'CAS_BINDER_RETRY_MAX_DELAY', 1.0)
+
+    budget.deposit()
+    attempt = 1
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= attempts or not is_transient(e) or \
+                    not budget.withdraw():
+                raise
+        sleep(backoff_delay(attempt, base_delay, max_delay))
+        attempt += 1
+
+
+def _start_thread(func):
+    """Call `func` in a new thread right away and return its Future."""
+    future = Future()
+
+    def run():
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+    thread = threading.Thread(target=run, name='cas-binder-call')
+    thread.daemon = True
+    thread.start()
+    return future
+
+
+def call_with_hedging(func, hedge_after=None, budget=None):
+    """Call `func` and, if it hasn't returned within `hedge_after` seconds,
+    call it once more concurrently and return whichever result arrives
+    first. Only use it for idempotent calls.
+    """
+    if hedge_after is None:
+        hedge_after = getattr(settings, 'CAS_BINDER_HEDGE_AFTER', None)
+    if hedge_after is None:
+        return func()
+    if budget is None:
+        budget = get_retry_budget()
+
+    # The first call gets its own thread, paired with the waiting caller, so
+    # that it neither queues for the pool (which would count towards
+    # hedge_after) nor caps concurrent calls. The pool only runs hedges.
+    executor = _get_hedge_executor()
+    futures = [_start_thread(func)]
+    done, _ = wait(futures, timeout=hedge_after)
+    if not done and budget.withdraw():
+        futures.append(executor.submit(func))
+
+    pending = set(futures)
+    while True:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+        if not pending:
+            return done.pop().result()
+
+
+def cas_call(func, idempotent=True):
+    """Call CAS through `func` with the configured retries and, for
+    idempotent calls, hedging. Non-idempotent calls (ticket validation -
+    tickets are single use) are only retried when CAS couldn't be reached.
+    """
+    if idempotent:
+        return call_with_retry(lambda: call_with_hedging(func))
+    return call_with_retry(func, is_transient=is_connection_error)
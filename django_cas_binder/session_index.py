@@ -0,0 +1,82 @@
+"""Index of sessions by universal id.
+
+With CAS_BINDER_SESSION_INDEX enabled, every session created by a CAS login
+is recorded in CASSession, so that all sessions of given universal ids can
+be evicted in time proportional to the number of sessions removed, whatever
+the session engine.
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.utils import timezone
+
+from django_cas_binder.models import CASSession
+
+
+UNIVERSAL_ID_ATTRIBUTE = '_cas_binder_universal_id'
+
+BATCH_SIZE = 500
+
+
+def is_enabled():
+    return getattr(settings, 'CAS_BINDER_SESSION_INDEX', False)
+
+
+def get_session_store():
+    return import_module(settings.SESSION_ENGINE).SessionStore()
+
+
+def user_logged_in(sender, request, user, **kwargs):
+    """Index the session of a user who logged in through CASBinderBackend,
+    which marks the request with the universal id."""
+    universal_id = getattr(request, UNIVERSAL_ID_ATTRIBUTE, None)
+    if not is_enabled() or universal_id is None:
+        return
+    session = getattr(request, 'session', None)
+    if session is None:
+        return
+    if session.session_key is None:
+        # login() flushes the session when another user was logged in on it
+        session.save()
+    CASSession.objects.update_or_create(
+        session_key=session.session_key,
+        defaults=dict(
+            universal_id=universal_id,
+            user=user,
+            expire_date=session.get_expiry_date(),
+        ))
+
+
+def user_logged_out(sender, request, user, **kwargs):
+    session = getattr(request, 'session', None)
+    if is_enabled() and session is not None and session.session_key:
+        CASSession.objects.filter(session_key=session.session_key).delete()
+
+
+def evict_sessions(universal_ids):
+    """Delete all indexed sessions of given universal ids. Return the number
+    of sessions deleted."""
+    session_keys = list(CASSession.objects
+                        .filter(universal_id__in=list(universal_ids))
+                        .values_list('session_key', flat=True))
+    store = get_session_store()
+    for i in range(0, len(session_keys), BATCH_SIZE):
+        batch = session_keys[i:i + BATCH_SIZE]
+        for session_key in batch:
+            store.delete(session_key)
+        CASSession.objects.filter(session_key__in=batch).delete()
+    return len(session_keys)
+
+
+def prune_session_index():
+    """Remove index entries of expired sessions that no longer exist. Return
+    the number of entries removed."""
+    store = get_session_store()
+    expired = CASSession.objects \
+        .filter(expire_date__lt=timezone.now()) \
+        .values_list('session_key', flat=True)
+    stale = [key for key in expired.iterator() if not store.exists(key)]
+    for i in range(0, len(stale), BATCH_SIZE):
+        CASSession.objects.filter(
+            session_key__in=stale[i:i + BATCH_SIZE]).delete()
+    return len(stale)
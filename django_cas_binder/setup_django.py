@@ -2,17 +2,26 @@ import django
 from django.conf import settings
 
 
-def setup_django():
-    settings.configure(
+def setup_django(**overrides):
+    options = dict(
         INSTALLED_APPS=[
             'django.contrib.auth',
             'django.contrib.contenttypes',
             'django_cas_binder'
         ],
-        DATABASES={'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': ':memory:'
-        }}
-
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:'
+            },
+            # a separate database standing in for a lagging read replica
+            'replica': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:'
+            },
+        },
+        SECRET_KEY='django_cas_binder',
     )
+    options.update(overrides)
+    settings.configure(**options)
     django.setup()
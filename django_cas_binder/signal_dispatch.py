@@ -0,0 +1,101 @@
+"""Asynchronous dispatch of signals sent on login.
+
+With CAS_BINDER_ASYNC_SIGNAL_DISPATCH enabled, CASBinderBackend hands the
+`cas_user_authenticated` payload, once the login's transaction commits, to a
+bounded queue served by a pool of worker threads, so login latency doesn't
+depend on its receivers. When the
+queue is full, the signal is either sent inline ('sync', which applies
+back-pressure to logins) or dropped ('drop'), as set by
+CAS_BINDER_SIGNAL_OVERFLOW. Exceptions raised by receivers are logged.
+"""
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class SignalDispatcher(object):
+    def __init__(self, workers=4, queue_size=1000, overflow='sync'):
+        if overflow not in ('sync', 'drop'):
+            raise ValueError(
+                'Unknown CAS_BINDER_SIGNAL_OVERFLOW policy: %r' % overflow)
+        self.workers = workers
+        self.overflow = overflow
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.threads = []
+        self.lock = threading.Lock()
+        self.stats = dict.fromkeys(
+            ['queued', 'delivered', 'failed', 'overflowed', 'dropped'], 0)
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def start(self):
+        with self.lock:
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(
+                    target=self.work,
+                    name='cas-binder-signals-%d' % len(self.threads))
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+
+    def send(self, signal, sender, **kwargs):
+        if len(self.threads) < self.workers:
+            self.start()
+        try:
+            self.queue.put_nowait((signal, sender, kwargs))
+        except queue.Full:
+            if self.overflow == 'drop':
+                self.count('dropped')
+                logger.warning('Signal queue is full, dropped %r', signal)
+            else:
+                self.count('overflowed')
+                signal.send(sender=sender, **kwargs)
+        else:
+            self.count('queued')
+
+    def deliver(self, signal, sender, kwargs):
+        failed = False
+        for receiver, response in signal.send_robust(sender=sender, **kwargs):
+            if isinstance(response, Exception):
+                failed = True
+                logger.error(
+                    'Signal receiver %r failed', receiver, exc_info=(
+                        type(response), response, response.__traceback__))
+        self.count('failed' if failed else 'delivered')
+
+    def work(self):
+        while True:
+            signal, sender, kwargs = self.queue.get()
+            try:
+                self.deliver(signal, sender, kwargs)
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+    def join(self):
+        """Block until every queued signal has been delivered."""
+        self.queue.join()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_signal_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = SignalDispatcher(
+                getattr(settings, 'CAS_BINDER_SIGNAL_WORKERS', 4),
+                getattr(settings, 'CAS_BINDER_SIGNAL_QUEUE_SIZE', 1000),
+                getattr(settings, 'CAS_BINDER_SIGNAL_OVERFLOW', 'sync'),
+            )
+        return _dispatcher
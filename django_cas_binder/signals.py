@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+
+# Sent inline on every CAS login, right before `cas_user_authenticated`, with
+# the same arguments. Receivers that must run before the login completes
+# should connect here when CAS_BINDER_ASYNC_SIGNAL_DISPATCH is enabled.
+cas_user_authenticated_sync = Signal()
@@ -0,0 +1,155 @@
+import hashlib
+import hmac
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from django_cas_binder.attribute_sync import apply_attribute_changes
+from django_cas_binder.models import CASUser
+from django_cas_binder.views import sync_attributes
+
+
+def event(universal_id, version, **attributes):
+    return {'universal_id': universal_id, 'version': version,
+            'attributes': attributes}
+
+
+@override_settings(CAS_BINDER_UPDATE_USER_ATTRIBUTES=['username', 'email'])
+class TestApplyAttributeChanges(TestCase):
+    def setUp(self):
+        self.users = []
+        for i in range(3):
+            user = get_user_model().objects.create(
+                username='user_%d' % i, email='user_%d@qed.ai' % i)
+            CASUser.objects.create(user=user, universal_id='uid_%d' % i)
+            self.users.append(user)
+
+    def test_changes_are_applied_in_one_update(self):
+        events = [
+            event('uid_0', 1, email='a@qed.ai'),
+            event('uid_1', 1, email='b@qed.ai'),
+            event('uid_2', 1, email='user_2@qed.ai'),
+        ]
+        # SAVEPOINT, SELECT, UPDATE users, UPDATE versions, RELEASE SAVEPOINT
+        with self.assertNumQueries(5):
+            result = apply_attribute_changes(events)
+
+        self.assertEqual(result, (2, [], []))
+        emails = [u.email for u in get_user_model().objects.order_by('pk')]
+        self.assertEqual(emails, ['a@qed.ai', 'b@qed.ai', 'user_2@qed.ai'])
+
+    def test_events_are_coalesced_and_unknown_ids_reported(self):
+        result = apply_attribute_changes([
+            event('uid_0', 2, email='b@qed.ai'),
+            event('fake', 1, email='x@qed.ai'),
+            event('uid_0', 1, email='a@qed.ai'),
+        ])
+        self.assertEqual(result, (1, ['fake'], []))
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].email, 'b@qed.ai')
+
+    def test_stale_events_are_skipped(self):
+        apply_attribute_changes([event('uid_0', 5, email='new@qed.ai')])
+
+        result = apply_attribute_changes([
+            event('uid_0', 5, email='replayed@qed.ai'),
+            event('uid_0', 4, email='late@qed.ai', first_name='Late'),
+        ])
+        self.assertEqual(result, (0, [], ['uid_0']))
+        self.assertEqual(
+            apply_attribute_changes([
+                event('uid_0', 4, email='late@qed.ai'),
+                event('uid_0', 6, username='newer'),
+            ]),
+            (1, [], []))
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].email, 'new@qed.ai')
+        self.assertEqual(self.users[0].username, 'newer')
+        self.assertEqual(
+            CASUser.objects.get(user=self.users[0]).attributes_version, 6)
+
+    def test_unlisted_attributes_are_ignored(self):
+        updated, unknown, stale = apply_attribute_changes([
+            event('uid_0', 1, first_name='Fake'),
+        ])
+        self.assertEqual(updated, 0)
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].first_name, '')
+
+    def test_username_collisions_within_batch_are_resolved(self):
+        apply_attribute_changes([
+            event('uid_0', 1, username='same'),
+            event('uid_1', 1, username='same'),
+        ])
+        usernames = sorted(
+            get_user_model().objects.values_list('username', flat=True))
+        self.assertEqual(usernames, ['same', 'same_2', 'user_2'])
+
+
+@override_settings(
+    CAS_BINDER_UPDATE_USER_ATTRIBUTES=['email'],
+    CAS_BINDER_WEBHOOK_SECRET='fake_secret')
+class TestSyncAttributesView(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='fake_username', email='old_fake_email@qed.ai')
+        CASUser.objects.create(user=self.user, universal_id='fake_uid')
+
+    def post(self, body, secret='fake_secret', timestamp=None,
+             signature=None):
+        timestamp = str(int(time.time()) if timestamp is None else timestamp)
+        body = body.encode('utf-8')
+        if signature is None:
+            signature = hmac.new(
+                secret.encode('utf-8'),
+                timestamp.encode('utf-8') + b'.' + body,
+                hashlib.sha256).hexdigest()
+        request = RequestFactory().post(
+            '/', body, content_type='application/json',
+            HTTP_X_CAS_TIMESTAMP=timestamp, HTTP_X_CAS_SIGNATURE=signature)
+        return sync_attributes(request)
+
+    def test_signed_events_are_applied(self):
+        body = json.dumps({'events': [
+            event('fake_uid', 1, email='fake_email@qed.ai'),
+        ]})
+        response = self.post(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content),
+            {'updated': 1, 'unknown': [], 'stale': []})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'fake_email@qed.ai')
+
+        # a replayed batch is not applied again
+        self.assertEqual(
+            json.loads(self.post(body).content),
+            {'updated': 0, 'unknown': [], 'stale': ['fake_uid']})
+
+    def test_bad_signature_is_rejected(self):
+        response = self.post('{"events": []}', secret='wrong_secret')
+        self.assertEqual(response.status_code, 403)
+
+    def test_non_ascii_signature_is_rejected(self):
+        response = self.post('{"events": []}', signature='\xe9')
+        self.assertEqual(response.status_code, 403)
+
+    def test_stale_timestamp_is_rejected(self):
+        response = self.post(
+            '{"events": []}', timestamp=int(time.time()) - 3600)
+        self.assertEqual(response.status_code, 403)
+
+    def test_malformed_events_are_rejected(self):
+        self.assertEqual(self.post('not json').status_code, 400)
+        self.assertEqual(self.post('{"events": [1]}').status_code, 400)
+        unversioned = json.dumps({'events': [
+            {'universal_id': 'fake_uid', 'attributes': {}}]})
+        self.assertEqual(self.post(unversioned).status_code, 400)
+
+    @override_settings(CAS_BINDER_WEBHOOK_SECRET=None)
+    def test_webhook_is_disabled_without_secret(self):
+        with self.assertRaises(Http404):
+            self.post('{"events": []}')
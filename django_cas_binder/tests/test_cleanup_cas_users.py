@@ -0,0 +1,122 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+import responses
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from django_cas_binder.models import CASUser
+
+
+CAS_UNIVERSAL_IDS = {
+    'known@qed.ai': 'known_id',
+    'moved@qed.ai': 'new_id',
+    'dup1@qed.ai': 'dup_id',
+    'dup2@qed.ai': 'dup_id',
+}
+
+
+@override_settings(CAS_SERVER_URL="https://fake-cas.qed.ai/")
+class TestCleanupCASUsers(TestCase):
+    def fake_cas_universal_ids_endpoint(self, request):
+        emails = json.loads(request.body.decode('utf-8'))['emails']
+        self.requested.append(emails)
+        errors = [dict(
+            error_code='no_such_user',
+            error_message='User with given email was not found.',
+            email=email,
+        ) for email in emails if email not in CAS_UNIVERSAL_IDS]
+        if errors:
+            return (404, {}, json.dumps({'errors': errors}))
+        return (200, {}, json.dumps({'universal_ids': dict(
+            (email, CAS_UNIVERSAL_IDS[email]) for email in emails)}))
+
+    def create_cas_user(self, username, email, universal_id, last_login=None):
+        user = get_user_model().objects.create_user(username, email)
+        user.last_login = last_login
+        user.save()
+        return CASUser.objects.create(user=user, universal_id=universal_id)
+
+    def setUp(self):
+        self.requested = []
+        now = timezone.now()
+        self.known = self.create_cas_user(
+            'known', 'known@qed.ai', 'known_id', now)
+        self.orphaned = self.create_cas_user(
+            'orphaned', 'orphaned@qed.ai', 'orphaned_id', now)
+        self.moved = self.create_cas_user(
+            'moved', 'moved@qed.ai', 'old_id', now)
+        self.dup_recent = self.create_cas_user(
+            'dup1', 'dup1@qed.ai', 'dup_id', now)
+        self.dup_stale = self.create_cas_user(
+            'dup2', 'dup2@qed.ai', 'dup_id', now - timedelta(days=400))
+
+    def cleanup(self, *args):
+        responses.add_callback(
+            responses.POST, "https://fake-cas.qed.ai/api/universal_ids/",
+            callback=self.fake_cas_universal_ids_endpoint,
+            content_type='application/json',
+        )
+        out = StringIO()
+        call_command('cleanup_cas_users', *args, stdout=out)
+        return out.getvalue()
+
+    def remaining(self):
+        return set(CASUser.objects.values_list('user__username', flat=True))
+
+    @responses.activate
+    def test_deletes_duplicate_mappings(self):
+        out = self.cleanup('--batch-size', '2')
+
+        self.assertEqual(
+            self.remaining(), {'known', 'orphaned', 'moved', 'dup1'})
+        self.assertIn('orphaned: user %s' % self.orphaned.pk, out)
+        self.assertIn('mismatched: user %s' % self.moved.pk, out)
+        self.assertIn(
+            '5 scanned, 1 orphaned, 1 duplicate, 1 mismatched, 0 inactive',
+            out)
+        # one call per batch, plus one retry without unknown emails
+        self.assertEqual(self.requested, [
+            ['known@qed.ai', 'orphaned@qed.ai'],
+            ['known@qed.ai'],
+            ['dup1@qed.ai', 'moved@qed.ai'],
+            ['dup2@qed.ai'],
+        ])
+
+    @responses.activate
+    def test_delete_orphaned(self):
+        self.cleanup('--delete-orphaned')
+
+        self.assertEqual(self.remaining(), {'known', 'moved', 'dup1'})
+
+    @responses.activate
+    def test_cas_server_error(self):
+        responses.add(
+            responses.POST, "https://fake-cas.qed.ai/api/universal_ids/",
+            status=503, body='<html>Service unavailable</html>')
+
+        with self.assertRaisesMessage(CommandError, 'CAS returned: 503'):
+            call_command('cleanup_cas_users', stdout=StringIO())
+        self.assertEqual(len(self.remaining()), 5)
+
+    @responses.activate
+    def test_dry_run(self):
+        out = self.cleanup(
+            '--dry-run', '--delete-orphaned', '--inactive-days', '365')
+
+        self.assertEqual(len(self.remaining()), 5)
+        self.assertIn('orphaned: user %s' % self.orphaned.pk, out)
+        self.assertIn('duplicate: user %s' % self.dup_stale.pk, out)
+        self.assertIn('inactive: user %s' % self.dup_stale.pk, out)
+        self.assertIn('1 inactive (dry run)', out)
+
+    @responses.activate
+    def test_skip_cas_check(self):
+        self.cleanup('--skip-cas-check')
+
+        self.assertEqual(self.requested, [])
+        self.assertEqual(
+            self.remaining(), {'known', 'orphaned', 'moved', 'dup1'})
@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from django_cas_binder.utils import compact_attributes
+
+
+class TestCompactAttributes(TestCase):
+    def test_keeps_all_attributes_by_default(self):
+        attributes = {'email': 'blah@qed.ai', 'username': 'blah'}
+        self.assertEqual(compact_attributes(attributes), attributes)
+
+    def test_keeps_only_selected_attributes(self):
+        self.assertEqual(
+            compact_attributes(
+                {'email': 'blah@qed.ai', 'username': 'blah', 'x': 'y'},
+                ['username', 'missing']),
+            {'username': 'blah'})
+
+    def test_drops_empty_values_and_unwraps_single_element_lists(self):
+        self.assertEqual(
+            compact_attributes(
+                {'email': '', 'groups': ['a'], 'roles': ['a', 'b'],
+                 'name': None}),
+            {'groups': 'a', 'roles': ['a', 'b']})
+
+    def test_max_size(self):
+        attributes = {'username': 'blah', 'bio': 'x' * 100, 'email': 'e'}
+        compacted = compact_attributes(
+            attributes, ['username', 'bio', 'email'], max_size=40)
+        self.assertEqual(compacted, {'username': 'blah', 'email': 'e'})
+        self.assertEqual(
+            compact_attributes(attributes, ['username', 'email'], 31),
+            {'username': 'blah', 'email': 'e'})
+        self.assertEqual(
+            compact_attributes(attributes, ['username', 'email'], 30),
+            {'username': 'blah'})
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from django_cas_binder.auth_backends import CASBinderBackend
+from django_cas_binder.db import (
+    cas_users_by_universal_id, first_cas_user, get_cas_user
+)
+from django_cas_binder.models import CASUser
+
+
+@override_settings(CAS_BINDER_READ_DATABASE='replica')
+class TestReadReplicaRouting(TestCase):
+    databases = {'default', 'replica'}
+
+    def create_cas_user(self, using, username, universal_id):
+        user = get_user_model().objects.db_manager(using).create_user(
+            username, username + '@qed.ai')
+        return CASUser.objects.using(using).create(
+            user=user, universal_id=universal_id)
+
+    def test_reads_from_replica_and_pins_to_primary(self):
+        self.create_cas_user('replica', 'replicated', 'replicated_id')
+
+        with self.assertNumQueries(0, using='default'), \
+                self.assertNumQueries(1, using='replica'):
+            cas_user = get_cas_user(universal_id='replicated_id')
+
+        self.assertEqual(cas_user.user.username, 'replicated')
+        self.assertEqual(cas_user._state.db, 'default')
+        self.assertEqual(cas_user.user._state.db, 'default')
+
+    def test_falls_back_to_primary_on_miss(self):
+        self.create_cas_user('default', 'lagging', 'lagging_id')
+
+        self.assertEqual(
+            get_cas_user(universal_id='lagging_id').user.username, 'lagging')
+        self.assertEqual(
+            first_cas_user(universal_id='lagging_id').user.username,
+            'lagging')
+        self.assertIsNone(first_cas_user(universal_id='missing_id'))
+        with self.assertRaises(CASUser.DoesNotExist):
+            get_cas_user(universal_id='missing_id')
+
+    def test_batch_lookup_falls_back_only_for_missing_ids(self):
+        self.create_cas_user('replica', 'replicated', 'replicated_id')
+        self.create_cas_user('default', 'lagging', 'lagging_id')
+
+        with self.assertNumQueries(1, using='default'), \
+                self.assertNumQueries(1, using='replica'):
+            cas_users = cas_users_by_universal_id(
+                ['replicated_id', 'lagging_id', 'missing_id'])
+
+        self.assertEqual(
+            dict((k, v.user.username) for k, v in cas_users.items()),
+            {'replicated_id': 'replicated', 'lagging_id': 'lagging'})
+
+    def test_backend_get_user(self):
+        user = self.create_cas_user('replica', 'replicated', 'id').user
+        backend = CASBinderBackend()
+
+        self.assertEqual(backend.get_user(user.pk)._state.db, 'default')
+        self.assertIsNone(backend.get_user(user.pk + 1000))
@@ -0,0 +1,126 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from django_cas_binder import deferred_updates
+from django_cas_binder.deferred_updates import (
+    AttributeUpdateQueue, defer_attribute_update
+)
+
+
+class TestAttributeUpdateQueue(TestCase):
+    def test_coalesces_changes_per_user(self):
+        user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+        other_user = get_user_model().objects.create_user(
+            username='other_username', email='other_email@qed.ai')
+        queue = AttributeUpdateQueue()
+
+        queue.add(user.pk, {'email': 'first@qed.ai'})
+        queue.add(user.pk, {'email': 'second@qed.ai', 'first_name': 'Blah'})
+        queue.add(other_user.pk, {'last_name': 'Bleh'})
+        self.assertEqual(len(queue), 2)
+
+        with self.assertNumQueries(2 * 3):  # savepoint, update, release
+            self.assertEqual(queue.flush(), 2)
+        self.assertEqual(len(queue), 0)
+        user.refresh_from_db()
+        other_user.refresh_from_db()
+        self.assertEqual(user.email, 'second@qed.ai')
+        self.assertEqual(user.first_name, 'Blah')
+        self.assertEqual(other_user.email, 'other_email@qed.ai')
+        self.assertEqual(other_user.last_name, 'Bleh')
+
+    def test_failed_update_does_not_stop_the_flush(self):
+        user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+        get_user_model().objects.create_user(username='taken', email='')
+        queue = AttributeUpdateQueue()
+
+        queue.add(user.pk, {'username': 'taken'})
+        queue.add(user.pk + 1000, {'email': 'nobody@qed.ai'})
+
+        with self.assertLogs('django_cas_binder.deferred_updates', 'ERROR'):
+            self.assertEqual(queue.flush(), 1)
+        user.refresh_from_db()
+        self.assertEqual(user.username, 'fake_username')
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            defer_attribute_update(1, {'email': 'e'}, 'later')
+
+
+class TestDeferAttributeUpdate(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+        self.other_user = get_user_model().objects.create_user(
+            username='other_username', email='other_email@qed.ai')
+        self.addCleanup(deferred_updates.queue.drain)
+
+    def test_on_commit_applies_only_its_own_changes(self):
+        deferred_updates.queue.add(self.other_user.pk, {'email': 'x@qed.ai'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            defer_attribute_update(
+                self.user.pk, {'email': 'new@qed.ai'}, 'on_commit')
+            self.user.refresh_from_db()
+            self.assertEqual(self.user.email, 'fake_email@qed.ai')
+
+        self.user.refresh_from_db()
+        self.other_user.refresh_from_db()
+        self.assertEqual(self.user.email, 'new@qed.ai')
+        self.assertEqual(self.other_user.email, 'other_email@qed.ai')
+        self.assertEqual(len(deferred_updates.queue), 1)
+
+    def test_rolled_back_changes_are_dropped(self):
+        for mode in ['on_commit', 'thread']:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                try:
+                    with transaction.atomic():
+                        defer_attribute_update(
+                            self.user.pk, {'email': 'new@qed.ai'}, mode)
+                        raise ValueError()
+                except ValueError:
+                    pass
+            self.assertEqual(callbacks, [])
+        self.assertEqual(len(deferred_updates.queue), 0)
+
+
+@override_settings(CAS_BINDER_DEFERRED_FLUSH_INTERVAL=0.01)
+class TestFlusherThread(TransactionTestCase):
+    def wait_for_email(self, user, email):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            user.refresh_from_db()
+            if user.email == email:
+                break
+            time.sleep(0.01)
+        self.assertEqual(user.email, email)
+
+    def test_thread_mode_applies_changes_in_the_background(self):
+        user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+
+        defer_attribute_update(user.pk, {'email': 'new@qed.ai'}, 'thread')
+
+        self.wait_for_email(user, 'new@qed.ai')
+        self.assertIsNotNone(deferred_updates._flusher)
+
+    def test_bad_changes_do_not_stop_the_flusher(self):
+        user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+        other_user = get_user_model().objects.create_user(
+            username='other_username', email='other_email@qed.ai')
+
+        with self.assertLogs('django_cas_binder.deferred_updates', 'ERROR'):
+            defer_attribute_update(user.pk, {'no_such_field': 1}, 'thread')
+            defer_attribute_update(
+                other_user.pk, {'email': 'other@qed.ai'}, 'thread')
+            self.wait_for_email(other_user, 'other@qed.ai')
+
+        # the flusher is still running
+        defer_attribute_update(user.pk, {'email': 'new@qed.ai'}, 'thread')
+        self.wait_for_email(user, 'new@qed.ai')
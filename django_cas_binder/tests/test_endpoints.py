@@ -0,0 +1,175 @@
+import requests
+import responses
+from django.test import TestCase, override_settings
+
+from django_cas_binder.cas_api import post_universal_ids
+from django_cas_binder.endpoints import (
+    EndpointSelector, get_endpoint_selector, relative_to_cas_server
+)
+from django_cas_binder.retry import RetryBudget
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestEndpointSelector(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.selector = EndpointSelector(
+            ['https://a/', 'https://b/'], decay=0.5, cooldown=5.0,
+            clock=self.clock)
+
+    def call(self, latencies, errors=None, budget=None):
+        errors = errors or {}
+        calls = []
+
+        def func(url):
+            calls.append(url)
+            self.clock.now += latencies.get(url, 0.0)
+            if url in errors:
+                raise errors[url]
+            return url
+        return self.selector.call(
+            func, budget=budget or RetryBudget(0.1)), calls
+
+    def urls(self):
+        return [endpoint.url for endpoint in self.selector.ordered()]
+
+    def test_fastest_endpoint_is_preferred(self):
+        latencies = {'https://a/': 0.2, 'https://b/': 0.05}
+        self.call(latencies)
+        self.assertEqual(self.urls(), ['https://b/', 'https://a/'])
+        self.call(latencies)
+
+        self.assertEqual(self.call(latencies), ('https://b/', ['https://b/']))
+
+    def test_latency_is_averaged(self):
+        endpoint = self.selector.endpoints[0]
+        self.selector.started(endpoint)
+        self.selector.succeeded(endpoint, 1.0)
+        self.selector.started(endpoint)
+        self.selector.succeeded(endpoint, 0.0)
+        self.assertEqual(endpoint.latency, 0.5)
+
+    def test_calls_in_flight_weigh_on_the_choice(self):
+        a, b = self.selector.endpoints
+        a.latency, b.latency = 0.1, 0.15
+        self.assertEqual(self.urls(), ['https://a/', 'https://b/'])
+        self.selector.started(a)
+        self.assertEqual(self.urls(), ['https://b/', 'https://a/'])
+
+    def test_transient_errors_fail_over(self):
+        result, calls = self.call(
+            {}, {'https://a/': requests.ConnectionError()})
+        self.assertEqual(result, 'https://b/')
+        self.assertEqual(calls, ['https://a/', 'https://b/'])
+        self.assertEqual(self.urls(), ['https://b/', 'https://a/'])
+
+        self.clock.now += 5.0
+        self.assertEqual(self.urls(), ['https://a/', 'https://b/'])
+
+    def test_cooldown_grows_with_consecutive_failures(self):
+        a = self.selector.endpoints[0]
+        for _ in range(3):
+            self.selector.started(a)
+            self.selector.failed(a)
+        self.assertEqual(a.down_until, 20.0)
+
+    def test_other_errors_are_raised_without_failing_over(self):
+        with self.assertRaises(ValueError):
+            self.call({}, {'https://a/': ValueError()})
+        self.assertEqual(self.selector.endpoints[0].failures, 0)
+
+    def test_last_error_is_raised_when_all_endpoints_fail(self):
+        error = requests.ConnectionError()
+        with self.assertRaises(requests.ConnectionError) as cm:
+            self.call({}, {
+                'https://a/': requests.ConnectionError(),
+                'https://b/': error})
+        self.assertIs(cm.exception, error)
+
+    def test_failover_draws_from_the_retry_budget(self):
+        error = requests.ConnectionError()
+        calls = []
+
+        def func(url):
+            calls.append(url)
+            raise error
+        with self.assertRaises(requests.ConnectionError) as cm:
+            self.selector.call(func, budget=RetryBudget(0, min_tokens=0))
+        self.assertIs(cm.exception, error)
+        self.assertEqual(calls, ['https://a/'])
+
+    def test_endpoints_that_are_down_are_skipped(self):
+        a = self.selector.endpoints[0]
+        self.selector.started(a)
+        self.selector.failed(a)
+
+        with self.assertRaises(requests.ConnectionError):
+            self.call({}, {'https://b/': requests.ConnectionError()})
+        self.assertEqual(
+            [endpoint.failures for endpoint in self.selector.endpoints],
+            [1, 1])
+
+    def test_only_one_endpoint_is_probed_when_all_are_down(self):
+        a, b = self.selector.endpoints
+        for endpoint in (b, a):
+            self.selector.started(endpoint)
+            self.selector.failed(endpoint)
+            self.clock.now += 1.0
+
+        errors = {
+            'https://a/': requests.ConnectionError(),
+            'https://b/': requests.ConnectionError()}
+        calls = []
+
+        def func(url):
+            calls.append(url)
+            raise errors[url]
+        with self.assertRaises(requests.ConnectionError) as cm:
+            self.selector.call(func, budget=RetryBudget(0.1))
+        self.assertIs(cm.exception, errors['https://b/'])
+        self.assertEqual(calls, ['https://b/'])
+
+        self.clock.now += 10.0
+        self.assertEqual(self.call({})[0], 'https://a/')
+
+
+@override_settings(CAS_BINDER_SERVER_URLS=[
+    'https://cas-a.qed.ai/', 'https://cas-b.qed.ai/'])
+class TestCASServerCall(TestCase):
+    def setUp(self):
+        get_endpoint_selector().endpoints[0].latency = 0.01
+        get_endpoint_selector().endpoints[1].latency = 0.02
+
+    def tearDown(self):
+        for endpoint in get_endpoint_selector().endpoints:
+            endpoint.latency, endpoint.failures = None, 0
+            endpoint.down_until = 0.0
+
+    @responses.activate
+    def test_unreachable_endpoint_fails_over(self):
+        responses.add(
+            responses.POST, 'https://cas-a.qed.ai/api/universal_ids/',
+            body=requests.ConnectionError())
+        responses.add(
+            responses.POST, 'https://cas-b.qed.ai/api/universal_ids/',
+            json={'universal_ids': {'fake@qed.ai': 'fake_uid'}})
+
+        self.assertEqual(
+            post_universal_ids(['fake@qed.ai']),
+            ({'fake@qed.ai': 'fake_uid'}, None))
+        self.assertEqual(
+            get_endpoint_selector().ordered()[0].url, 'https://cas-b.qed.ai/')
+
+    def test_relative_to_cas_server(self):
+        self.assertEqual(
+            relative_to_cas_server('https://cas-b.qed.ai/openid/userinfo'),
+            'openid/userinfo')
+        self.assertIsNone(
+            relative_to_cas_server('https://elsewhere.qed.ai/userinfo'))
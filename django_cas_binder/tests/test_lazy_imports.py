@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+
+PROBE = """
+import sys
+from django_cas_binder.setup_django import setup_django
+setup_django()
+import %s
+print(','.join(m for m in ('oic', 'requests') if m in sys.modules))
+"""
+
+
+class TestLazyImports(SimpleTestCase):
+    def loaded_dependencies(self, module):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        output = subprocess.check_output(
+            [sys.executable, '-c', PROBE % module], cwd=root)
+        return output.decode('utf-8').strip()
+
+    def test_auth_backends_does_not_import_requests(self):
+        self.assertEqual(
+            self.loaded_dependencies('django_cas_binder.auth_backends'), '')
+
+    def test_oic_rest_auth_does_not_import_oic_nor_requests(self):
+        self.assertEqual(
+            self.loaded_dependencies('django_cas_binder.oic_rest_auth'), '')
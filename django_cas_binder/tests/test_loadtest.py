@@ -0,0 +1,61 @@
+import requests
+from django.test import TestCase, override_settings
+
+from django_cas_binder.loadtest import (
+    FakeCASServer, LoadTest, make_access_token, make_ticket, percentile
+)
+
+
+class TestFakeCASServer(TestCase):
+    def setUp(self):
+        self.server = FakeCASServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def test_endpoints(self):
+        r = requests.get(self.server.url + 'serviceValidate', params={
+            'ticket': make_ticket('uid_1', 'blah'), 'service': 'x'})
+        self.assertIn('<cas:user>uid_1</cas:user>', r.text)
+        r = requests.get(self.server.url + 'openid/userinfo', params={
+            'access_token': make_access_token('uid_1')})
+        self.assertEqual(r.json(), {'universal_id': 'uid_1'})
+        r = requests.get(self.server.url + 'openid/userinfo', params={
+            'access_token': 'bad'})
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(self.server.calls, {
+            '/serviceValidate': 1, '/openid/userinfo': 2})
+
+    def test_error_injection(self):
+        self.server.error_rate = 1.0
+        r = requests.get(self.server.url + 'openid/userinfo')
+        self.assertEqual(r.status_code, 503)
+
+
+class TestLoadTest(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 51)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 99), 0.0)
+
+    def test_run_one(self):
+        server = FakeCASServer()
+        server.start()
+        self.addCleanup(server.stop)
+        load_test = LoadTest(
+            {'first_login': 1, 'repeat_login': 1, 'token': 1},
+            users=3, usernames=1, tokens=2, seed=0)
+        load_test.view = load_test.make_view()
+
+        with override_settings(
+                CAS_SERVER_URL=server.url, CAS_CREATE_USER=True):
+            load_test.populate()
+            results = [load_test.run_one() for _ in range(10)]
+
+        self.assertEqual(
+            [(kind, error) for kind, _, _, error in results
+             if error is not None], [])
+        self.assertEqual(
+            set(kind for kind, _, _, _ in results),
+            {'first_login', 'repeat_login', 'token'})
+        self.assertTrue(all(queries > 0 for _, _, queries, _ in results))
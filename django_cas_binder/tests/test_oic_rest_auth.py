@@ -1,6 +1,13 @@
+import json
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
 import responses
 from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
 from rest_framework.test import APIRequestFactory  # NOQA
+from rest_framework.test import force_authenticate
 import rest_framework.views
 from django.contrib.auth import get_user_model
 
@@ -8,8 +15,11 @@ from django_cas_binder.models import CASUser
 
 from django_cas_binder.oic_rest_auth import (
     BaseOICAuthentication, make_oic_authentication_class,
-    make_oic_scope_claim_permission_class, CASResponseError
+    make_oic_scope_claim_permission_class, CASResponseError,
+    validate_access_tokens,
 )
+from django_cas_binder.oic_rest_views import AccessTokenValidationView
+from django_cas_binder.throttling import LocalTokenBucketStore
 
 
 class RestFrameworkAuthTestMixin(object):
@@ -143,6 +153,20 @@ class TestBaseOICAuthentication(TestCase, RestFrameworkAuthTestMixin):
         with self.assertRaises(CASResponseError):
             self.perform_auth(self.auth, status=500)
 
+    @override_settings(CAS_BINDER_TOKEN_AUTH_RATE='1/min')
+    @mock.patch(
+        'django_cas_binder.throttling._local_store', LocalTokenBucketStore())
+    @responses.activate
+    def test_auth_throttled(self):
+        self.auth = {'universal_id': 'fake_universal_id'}
+        self.perform_auth(self.auth)
+        cas_calls = len(responses.calls)
+
+        response = self.perform_auth(self.auth)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(responses.calls), cas_calls)
+
 
 @override_settings(CAS_SERVER_URL="https://fake-cas.qed.ai/")
 class TestMakeOICScopeClaimPermissionClass(
@@ -196,3 +220,165 @@ class TestMakeOicAuthenticationClass(
         TestMakeOICScopeClaimPermissionClass, TestBaseOICAuthentication):
     authentication_classes = make_oic_authentication_class("can_blah"),
     permission_classes = None
+
+
+def add_fake_userinfo_endpoint(userinfo_by_token):
+    """Mock CAS discovery and a userinfo endpoint answering with
+    userinfo_by_token[access_token] (json encoded unless it is a string), or
+    401 for unknown tokens. Return the list of access tokens the endpoint was
+    called with.
+    """
+    calls = []
+
+    def userinfo(request):
+        token = parse_qs(urlparse(request.url).query)['access_token'][0]
+        calls.append(token)
+        if token not in userinfo_by_token:
+            return (401, {'WWW-Authenticate': 'invalid_token'}, '')
+        body = userinfo_by_token[token]
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        return (200, {}, body)
+
+    responses.add(
+        responses.GET,
+        "https://fake-cas.qed.ai/openid/.well-known/openid-configuration",
+        json={
+            "issuer": "https://fake-cas.qed.ai/openid",
+            "userinfo_endpoint": "https://fake-cas.qed.ai/openid/userinfo",
+        },
+        status=200,
+    )
+    responses.add_callback(
+        responses.GET, "https://fake-cas.qed.ai/openid/userinfo",
+        callback=userinfo, content_type='application/json',
+    )
+    return calls
+
+
+@override_settings(CAS_SERVER_URL="https://fake-cas.qed.ai/")
+class TestValidateAccessTokens(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+        CASUser.objects.create(user=self.user, universal_id='fake_universal_id')
+
+    @responses.activate
+    def test_validate_access_tokens(self):
+        calls = add_fake_userinfo_endpoint({
+            'good': {'universal_id': 'fake_universal_id'},
+            'unknown_user': {'universal_id': 'other_universal_id'},
+            'no_universal_id': {'bla': 'bla'},
+            'not_json': '<html>Bad gateway</html>',
+            'not_an_object': ['fake_universal_id'],
+        })
+
+        with self.assertNumQueries(1):
+            results = validate_access_tokens([
+                'good', 'bad', 'good', 'unknown_user', 'no_universal_id',
+                'not_json', 'not_an_object', ''])
+
+        self.assertEqual(sorted(calls), sorted(
+            ['good', 'bad', 'unknown_user', 'no_universal_id', 'not_json',
+             'not_an_object']))
+        self.assertEqual(set(results), set(calls))
+        self.assertEqual(results['good'].user.pk, self.user.pk)
+        self.assertEqual(
+            results['good'].payload, {'universal_id': 'fake_universal_id'})
+        self.assertIsNone(results['good'].error)
+        self.assertIsInstance(results['bad'].error, AuthenticationFailed)
+        self.assertIsNone(results['unknown_user'].user)
+        self.assertIsInstance(
+            results['unknown_user'].error, AuthenticationFailed)
+        self.assertIsInstance(
+            results['no_universal_id'].error, CASResponseError)
+        self.assertIsInstance(results['not_json'].error, CASResponseError)
+        self.assertIsInstance(
+            results['not_an_object'].error, CASResponseError)
+
+    def test_no_tokens(self):
+        self.assertEqual(validate_access_tokens([]), {})
+
+    @responses.activate
+    def test_view(self):
+        add_fake_userinfo_endpoint({
+            'good': {'universal_id': 'fake_universal_id'},
+        })
+        request = APIRequestFactory().post(
+            '/', {'access_tokens': ['good', 'bad']}, format='json')
+        force_authenticate(
+            request, get_user_model()(username='admin', is_staff=True))
+
+        response = AccessTokenValidationView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'results': [
+            {
+                'universal_id': 'fake_universal_id',
+                'user_id': self.user.pk,
+                'payload': {'universal_id': 'fake_universal_id'},
+            },
+            {'error': 'invalid_token'},
+        ]})
+
+    def test_view_rejects_non_list(self):
+        request = APIRequestFactory().post(
+            '/', {'access_tokens': 'good'}, format='json')
+        force_authenticate(
+            request, get_user_model()(username='admin', is_staff=True))
+
+        response = AccessTokenValidationView.as_view()(request)
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CAS_SERVER_URL="https://fake-cas.qed.ai/")
+class TestOICAuthenticationMemoization(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+        CASUser.objects.create(user=self.user, universal_id='fake_universal_id')
+
+    def make_request(self, access_token):
+        return Request(APIRequestFactory().get(
+            '/', {'access_token': access_token}))
+
+    @responses.activate
+    def test_stacked_authentication_classes_validate_once(self):
+        calls = add_fake_userinfo_endpoint({
+            'good': {'universal_id': 'fake_universal_id', 'can_blah': True},
+        })
+        request = self.make_request('good')
+
+        for authentication_class in [
+                make_oic_authentication_class('can_blah'),
+                BaseOICAuthentication,
+                make_oic_authentication_class()]:
+            user, auth = authentication_class().authenticate(request)
+            self.assertEqual(user.pk, self.user.pk)
+        # a new DRF request wrapping the same HttpRequest reuses it too
+        BaseOICAuthentication().authenticate(Request(request._request))
+
+        self.assertEqual(calls, ['good'])
+
+    @responses.activate
+    def test_failures_are_memoized(self):
+        calls = add_fake_userinfo_endpoint({})
+        request = self.make_request('bad')
+
+        for _ in range(2):
+            with self.assertRaises(AuthenticationFailed):
+                BaseOICAuthentication().authenticate(request)
+
+        self.assertEqual(calls, ['bad'])
+
+    @responses.activate
+    def test_requests_are_not_shared(self):
+        calls = add_fake_userinfo_endpoint({
+            'good': {'universal_id': 'fake_universal_id'},
+        })
+
+        for _ in range(2):
+            BaseOICAuthentication().authenticate(self.make_request('good'))
+
+        self.assertEqual(calls, ['good', 'good'])
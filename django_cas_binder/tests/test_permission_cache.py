@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from django_cas_binder import permission_cache
+from django_cas_binder.auth_backends import CASBinderBackend
+
+
+@override_settings(CAS_BINDER_PERMISSION_CACHE_TIMEOUT=60)
+class TestPermissionCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.backend = CASBinderBackend()
+        self.user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+        self.group = Group.objects.create(name='group')
+        self.user.groups.add(self.group)
+        self.change_user = Permission.objects.get(codename='change_user')
+        self.delete_user = Permission.objects.get(codename='delete_user')
+        self.group.permissions.add(self.change_user)
+
+    def permissions(self):
+        # a fresh instance, as in a new request
+        user = get_user_model().objects.get(pk=self.user.pk)
+        return self.backend.get_all_permissions(user)
+
+    def test_permissions_are_shared_between_user_instances(self):
+        self.assertEqual(self.permissions(), {'auth.change_user'})
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.backend.has_perm(user, 'auth.change_user'))
+            self.assertFalse(self.backend.has_perm(user, 'auth.delete_user'))
+
+    def test_invalidated_on_user_permission_change(self):
+        self.permissions()
+        self.user.user_permissions.add(self.delete_user)
+        self.assertEqual(
+            self.permissions(), {'auth.change_user', 'auth.delete_user'})
+
+    def test_invalidated_on_group_membership_change(self):
+        self.permissions()
+        self.group.user_set.remove(self.user)
+        self.assertEqual(self.permissions(), set())
+
+    def test_invalidated_on_group_permission_change(self):
+        self.permissions()
+        self.group.permissions.add(self.delete_user)
+        self.assertEqual(
+            self.permissions(), {'auth.change_user', 'auth.delete_user'})
+
+    def test_invalidated_on_group_deletion(self):
+        self.permissions()
+        self.group.delete()
+        self.assertEqual(self.permissions(), set())
+
+    def test_not_cached_when_invalidated_while_computing(self):
+        def compute():
+            permission_cache.invalidate_user(self.user.pk)
+            return {'auth.stale'}
+
+        self.assertEqual(
+            permission_cache.get_permissions(self.user.pk, compute),
+            {'auth.stale'})
+        self.assertEqual(self.permissions(), {'auth.change_user'})
+
+    def test_not_cached_when_all_invalidated_while_computing(self):
+        def compute():
+            permission_cache.invalidate_all()
+            return {'auth.stale'}
+
+        permission_cache.get_permissions(self.user.pk, compute)
+        self.assertEqual(self.permissions(), {'auth.change_user'})
+
+    def test_inactive_user_has_no_permissions(self):
+        self.permissions()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.permissions(), set())
+
+    @override_settings(CAS_BINDER_PERMISSION_CACHE_TIMEOUT=None)
+    def test_disabled_by_default(self):
+        self.permissions()
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(2):
+            self.backend.get_all_permissions(user)
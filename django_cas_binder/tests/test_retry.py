@@ -0,0 +1,185 @@
+import threading
+
+import requests
+import responses
+from django.test import TestCase, override_settings
+
+from django_cas_binder.oic_rest_auth import (
+    CASResponseError, CASServerError, fetch_userinfo, get_userinfo_endpoint
+)
+from django_cas_binder.retry import (
+    RetryBudget, _get_hedge_executor, backoff_delay, call_with_hedging,
+    call_with_retry
+)
+
+
+class FlakyCall(object):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+class TestCallWithRetry(TestCase):
+    def setUp(self):
+        self.delays = []
+
+    def call(self, func, attempts=3, budget=None, **kwargs):
+        return call_with_retry(
+            func, attempts=attempts, budget=budget or RetryBudget(0.1),
+            sleep=self.delays.append, **kwargs)
+
+    def test_retries_transient_errors(self):
+        func = FlakyCall([requests.ConnectionError(), CASServerError()])
+        self.assertEqual(self.call(func), 'ok')
+        self.assertEqual(func.calls, 3)
+        self.assertEqual(len(self.delays), 2)
+
+    def test_gives_up_after_attempts(self):
+        func = FlakyCall([requests.Timeout()] * 3)
+        with self.assertRaises(requests.Timeout):
+            self.call(func)
+        self.assertEqual(func.calls, 3)
+
+    def test_does_not_retry_other_errors(self):
+        func = FlakyCall([ValueError()])
+        with self.assertRaises(ValueError):
+            self.call(func)
+        self.assertEqual(func.calls, 1)
+
+    def test_respects_budget(self):
+        func = FlakyCall([requests.ConnectionError()] * 2)
+        with self.assertRaises(requests.ConnectionError):
+            self.call(func, budget=RetryBudget(0, min_tokens=1))
+        self.assertEqual(func.calls, 2)
+
+    def test_retries_disabled_by_default(self):
+        func = FlakyCall([requests.ConnectionError()])
+        with self.assertRaises(requests.ConnectionError):
+            call_with_retry(func)
+        self.assertEqual(func.calls, 1)
+
+    def test_backoff_delay_is_capped(self):
+        for attempt in range(1, 10):
+            delay = backoff_delay(attempt, 0.05, 0.3)
+            self.assertTrue(0 <= delay <= min(0.3, 0.05 * 2 ** (attempt - 1)))
+
+
+class TestRetryBudget(TestCase):
+    def test_deposits_a_fraction_of_a_retry_per_call(self):
+        budget = RetryBudget(0.5, min_tokens=0)
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+
+class TestCallWithHedging(TestCase):
+    def test_returns_first_answer(self):
+        first_call = threading.Event()
+        release = threading.Event()
+
+        def func():
+            if not first_call.is_set():
+                first_call.set()
+                release.wait(5)
+                return 'slow'
+            return 'fast'
+
+        try:
+            result = call_with_hedging(func, 0.01, RetryBudget(0.1))
+        finally:
+            release.set()
+        self.assertEqual(result, 'fast')
+
+    def test_no_hedge_without_budget(self):
+        calls = []
+
+        def func():
+            calls.append(1)
+            threading.Event().wait(0.05)
+            return 'ok'
+
+        result = call_with_hedging(func, 0.01, RetryBudget(0, min_tokens=0))
+        self.assertEqual(result, 'ok')
+        self.assertEqual(len(calls), 1)
+
+    def test_raises_when_all_calls_fail(self):
+        with self.assertRaises(ValueError):
+            call_with_hedging(FlakyCall([ValueError()]), 1, RetryBudget(0.1))
+
+    def test_first_call_does_not_wait_for_hedge_pool(self):
+        busy = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            return 'ok'
+
+        # keep every worker of the hedge pool busy
+        executor = _get_hedge_executor()
+        blockers = [
+            executor.submit(busy.wait, 5)
+            for _ in range(executor._max_workers)]
+        try:
+            result = call_with_hedging(func, 1, RetryBudget(0.1))
+        finally:
+            busy.set()
+            for blocker in blockers:
+                blocker.result()
+        self.assertEqual(result, 'ok')
+        self.assertEqual(len(calls), 1)
+
+
+class TestFetchUserinfoRetries(TestCase):
+    @override_settings(
+        CAS_BINDER_RETRY_ATTEMPTS=2, CAS_BINDER_RETRY_BASE_DELAY=0)
+    @responses.activate
+    def test_retries_server_errors(self):
+        responses.add(
+            responses.GET, "https://fake-cas.qed.ai/openid/userinfo",
+            status=503)
+        responses.add(
+            responses.GET, "https://fake-cas.qed.ai/openid/userinfo",
+            json={'universal_id': 'fake_universal_id'})
+
+        self.assertEqual(
+            fetch_userinfo(
+                "https://fake-cas.qed.ai/openid/userinfo", 'fake_token'),
+            {'universal_id': 'fake_universal_id'})
+        self.assertEqual(len(responses.calls), 2)
+
+
+@override_settings(
+    CAS_SERVER_URL='https://fake-cas.qed.ai/',
+    CAS_BINDER_RETRY_ATTEMPTS=3, CAS_BINDER_RETRY_BASE_DELAY=0)
+class TestDiscoveryRetries(TestCase):
+    url = 'https://fake-cas.qed.ai/openid/.well-known/openid-configuration'
+
+    @responses.activate
+    def test_retries_server_errors(self):
+        responses.add(responses.GET, self.url, status=503)
+        responses.add(responses.GET, self.url, json={
+            'issuer': 'https://fake-cas.qed.ai/openid',
+            'userinfo_endpoint': 'https://fake-cas.qed.ai/openid/userinfo',
+        })
+
+        self.assertEqual(
+            get_userinfo_endpoint(), 'https://fake-cas.qed.ai/openid/userinfo')
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_does_not_retry_other_errors(self):
+        responses.add(responses.GET, self.url, status=404)
+
+        with self.assertRaises(CASResponseError) as cm:
+            get_userinfo_endpoint()
+        self.assertNotIsInstance(cm.exception, CASServerError)
+        self.assertEqual(len(responses.calls), 1)
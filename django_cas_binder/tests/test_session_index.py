@@ -0,0 +1,108 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model, login, logout
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from django_cas_binder.models import CASSession
+from django_cas_binder.session_index import (
+    UNIVERSAL_ID_ATTRIBUTE, evict_sessions, prune_session_index
+)
+
+
+@override_settings(
+    CAS_BINDER_SESSION_INDEX=True,
+    SESSION_ENGINE='django.contrib.sessions.backends.cache')
+class TestSessionIndex(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+
+    def cas_login(self, universal_id, user=None, session=None):
+        request = RequestFactory().get('/')
+        request.session = session or SessionStore()
+        setattr(request, UNIVERSAL_ID_ATTRIBUTE, universal_id)
+        login(request, user or self.user,
+              backend='django_cas_binder.auth_backends.CASBinderBackend')
+        request.session.save()
+        return request
+
+    def test_cas_logins_are_indexed(self):
+        request = self.cas_login('fake_universal_id')
+
+        cas_session, = CASSession.objects.all()
+        self.assertEqual(cas_session.session_key, request.session.session_key)
+        self.assertEqual(cas_session.universal_id, 'fake_universal_id')
+        self.assertEqual(cas_session.user, self.user)
+
+    def test_account_switch_is_indexed(self):
+        other_user = get_user_model().objects.create_user(
+            username='other_username', email='other_email@qed.ai')
+        request = self.cas_login('uid_a')
+        request = self.cas_login('uid_b', other_user, request.session)
+
+        cas_session = CASSession.objects.get(
+            session_key=request.session.session_key)
+        self.assertEqual(cas_session.universal_id, 'uid_b')
+        self.assertEqual(cas_session.user, other_user)
+
+    def test_other_logins_are_not_indexed(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        login(request, self.user,
+              backend='django.contrib.auth.backends.ModelBackend')
+        self.assertFalse(CASSession.objects.exists())
+
+    @override_settings(CAS_BINDER_SESSION_INDEX=False)
+    def test_disabled_by_default(self):
+        self.cas_login('fake_universal_id')
+        self.assertFalse(CASSession.objects.exists())
+
+    def test_logout_removes_index_entry(self):
+        request = self.cas_login('fake_universal_id')
+        request.user = self.user
+        logout(request)
+        self.assertFalse(CASSession.objects.exists())
+
+    def test_evict_sessions(self):
+        evicted = [self.cas_login('evicted_id') for _ in range(2)]
+        kept = self.cas_login('kept_id')
+
+        with self.assertNumQueries(2):
+            self.assertEqual(evict_sessions(['evicted_id', 'other_id']), 2)
+
+        for request in evicted:
+            self.assertFalse(SessionStore().exists(
+                request.session.session_key))
+        self.assertTrue(SessionStore().exists(kept.session.session_key))
+        self.assertEqual(
+            list(CASSession.objects.values_list('universal_id', flat=True)),
+            ['kept_id'])
+
+    def test_prune(self):
+        expired = self.cas_login('fake_universal_id')
+        extended = self.cas_login('fake_universal_id')
+        CASSession.objects.update(
+            expire_date=timezone.now() - timedelta(days=1))
+        SessionStore().delete(expired.session.session_key)
+
+        self.assertEqual(prune_session_index(), 1)
+        self.assertEqual(
+            list(CASSession.objects.values_list('session_key', flat=True)),
+            [extended.session.session_key])
+
+    def test_command(self):
+        self.cas_login('evicted_id')
+        out = StringIO()
+        with mock.patch(
+                'django_cas_binder.management.commands.evict_cas_sessions.'
+                'prune_session_index', return_value=0):
+            call_command(
+                'evict_cas_sessions', 'evicted_id', '--prune', stdout=out)
+        self.assertEqual(
+            out.getvalue(), '1 sessions evicted\n0 index entries pruned\n')
+        self.assertFalse(CASSession.objects.exists())
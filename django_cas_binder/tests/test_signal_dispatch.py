@@ -0,0 +1,84 @@
+import threading
+
+from django.dispatch import Signal
+from django.test import SimpleTestCase
+
+from django_cas_binder.signal_dispatch import SignalDispatcher
+
+
+class TestSignalDispatcher(SimpleTestCase):
+    def setUp(self):
+        self.signal = Signal()
+        self.received = []
+
+    def receiver(self, sender, **kwargs):
+        self.received.append((sender, kwargs, threading.current_thread()))
+
+    def test_delivers_in_worker_threads(self):
+        self.signal.connect(self.receiver, weak=False)
+        dispatcher = SignalDispatcher(workers=2)
+
+        dispatcher.send(self.signal, sender='sender', user='user')
+        dispatcher.join()
+
+        (sender, kwargs, thread), = self.received
+        self.assertEqual(sender, 'sender')
+        self.assertEqual(kwargs, {'signal': self.signal, 'user': 'user'})
+        self.assertIsNot(thread, threading.current_thread())
+        self.assertEqual(dispatcher.stats['queued'], 1)
+        self.assertEqual(dispatcher.stats['delivered'], 1)
+
+    def test_logs_failing_receivers(self):
+        def failing_receiver(sender, **kwargs):
+            raise ValueError()
+        self.signal.connect(failing_receiver, weak=False)
+        dispatcher = SignalDispatcher(workers=1)
+
+        with self.assertLogs('django_cas_binder.signal_dispatch', 'ERROR'):
+            dispatcher.send(self.signal, sender='sender')
+            dispatcher.join()
+        self.assertEqual(dispatcher.stats['failed'], 1)
+
+    def block_worker(self, dispatcher):
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_receiver(sender, **kwargs):
+            started.set()
+            release.wait(5)
+        blocking_signal = Signal()
+        blocking_signal.connect(blocking_receiver, weak=False)
+        dispatcher.send(blocking_signal, sender='blocker')
+        started.wait(5)
+        self.addCleanup(release.set)
+        return release
+
+    def test_overflow_sent_inline(self):
+        self.signal.connect(self.receiver, weak=False)
+        dispatcher = SignalDispatcher(workers=1, queue_size=1)
+        release = self.block_worker(dispatcher)
+
+        dispatcher.send(self.signal, sender='queued')
+        dispatcher.send(self.signal, sender='inline')
+
+        (sender, _, thread), = self.received
+        self.assertEqual(sender, 'inline')
+        self.assertIs(thread, threading.current_thread())
+        self.assertEqual(dispatcher.stats['overflowed'], 1)
+        release.set()
+        dispatcher.join()
+        self.assertEqual(len(self.received), 2)
+
+    def test_overflow_dropped(self):
+        self.signal.connect(self.receiver, weak=False)
+        dispatcher = SignalDispatcher(
+            workers=1, queue_size=1, overflow='drop')
+        release = self.block_worker(dispatcher)
+
+        dispatcher.send(self.signal, sender='queued')
+        with self.assertLogs('django_cas_binder.signal_dispatch', 'WARNING'):
+            dispatcher.send(self.signal, sender='dropped')
+
+        self.assertEqual(dispatcher.stats['dropped'], 1)
+        release.set()
+        dispatcher.join()
+        self.assertEqual([r[0] for r in self.received], ['queued'])
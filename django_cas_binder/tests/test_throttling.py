@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from django_cas_binder.throttling import (
+    CacheTokenBucketStore, LocalTokenBucketStore, allow_token_auth_attempt,
+    parse_rate,
+)
+
+
+class TestTokenBucketStores(TestCase):
+    def check_store(self, store):
+        self.assertEqual(store.take('k', 2, 1.0, 100), (True, 1))
+        self.assertEqual(store.take('k', 2, 1.0, 100), (True, 0))
+        self.assertEqual(store.take('k', 2, 1.0, 100), (False, 0))
+        self.assertEqual(store.take('k', 2, 1.0, 100.5), (False, 0.5))
+        self.assertEqual(store.take('k', 2, 1.0, 101), (True, 0))
+        self.assertEqual(store.take('other', 2, 1.0, 101), (True, 1))
+        self.assertEqual(store.take('k', 2, 1.0, 1000), (True, 1))
+
+    def test_local_store(self):
+        self.check_store(LocalTokenBucketStore())
+
+    def test_local_store_is_bounded(self):
+        store = LocalTokenBucketStore(max_keys=2)
+        for key in ['a', 'b', 'c']:
+            store.take(key, 1, 1.0, 100)
+        self.assertEqual(list(store.buckets), ['b', 'c'])
+
+    def test_cache_store(self):
+        self.check_store(CacheTokenBucketStore('default'))
+
+
+class TestAllowTokenAuthAttempt(TestCase):
+    def setUp(self):
+        patcher = mock.patch(
+            'django_cas_binder.throttling._local_store',
+            LocalTokenBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, ip):
+        return APIRequestFactory().get('/', REMOTE_ADDR=ip)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('60/min'), (60, 60))
+        self.assertEqual(parse_rate('5/s'), (5, 1))
+
+    def test_disabled_by_default(self):
+        for _ in range(100):
+            self.assertEqual(
+                allow_token_auth_attempt(self.request('1.2.3.4'), 'token'),
+                (True, None))
+
+    @override_settings(CAS_BINDER_TOKEN_AUTH_RATE='2/min')
+    def test_keyed_by_ip(self):
+        request = self.request('1.2.3.4')
+        self.assertTrue(allow_token_auth_attempt(request, 'a', 0)[0])
+        self.assertTrue(allow_token_auth_attempt(request, 'b', 0)[0])
+        self.assertEqual(
+            allow_token_auth_attempt(request, 'c', 0), (False, 30))
+        self.assertTrue(
+            allow_token_auth_attempt(self.request('4.3.2.1'), 'c', 0)[0])
+
+    @override_settings(
+        CAS_BINDER_TOKEN_AUTH_RATE='1/min',
+        CAS_BINDER_TOKEN_AUTH_BURST=2,
+        CAS_BINDER_TOKEN_AUTH_THROTTLE_KEY='token')
+    def test_keyed_by_token(self):
+        request = self.request('1.2.3.4')
+        token = 'eyJhbGciOiJSUzI1NiJ9.' + 'x' * 20
+        for _ in range(2):
+            self.assertTrue(allow_token_auth_attempt(request, token, 0)[0])
+        self.assertFalse(allow_token_auth_attempt(request, token, 0)[0])
+        # tokens sharing a prefix have their own buckets
+        self.assertTrue(
+            allow_token_auth_attempt(request, token[:-1] + 'y', 0)[0])
+        self.assertTrue(allow_token_auth_attempt(request, 'other', 0)[0])
+
+    @override_settings(
+        CAS_BINDER_TOKEN_AUTH_RATE='1/min',
+        CAS_BINDER_TOKEN_AUTH_THROTTLE_CACHE='default')
+    def test_cache_store(self):
+        request = self.request('1.2.3.5')
+        self.assertTrue(allow_token_auth_attempt(request, 'a', 0)[0])
+        self.assertFalse(allow_token_auth_attempt(request, 'a', 0)[0])
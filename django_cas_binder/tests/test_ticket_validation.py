@@ -0,0 +1,105 @@
+import json
+
+import responses
+from cas import CASClientV3
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from django_cas_binder.auth_backends import CASBinderBackend
+from django_cas_binder.loadtest import (
+    FAILURE_JSON, FAILURE_XML, SUCCESS_XML, success_json
+)
+from django_cas_binder.models import CASUser
+from django_cas_binder.ticket_validation import (
+    TicketValidationError, parse_json_response
+)
+
+
+class TestParseJsonResponse(TestCase):
+    def test_success_is_parsed_like_xml(self):
+        xml = SUCCESS_XML % {
+            'universal_id': 'fake_uid', 'username': 'fake_username'}
+        self.assertEqual(
+            parse_json_response(success_json('fake_uid', 'fake_username')),
+            CASClientV3.parse_response_xml(xml))
+
+    def test_failure_is_parsed_like_xml(self):
+        self.assertEqual(
+            parse_json_response(FAILURE_JSON),
+            CASClientV3.parse_response_xml(FAILURE_XML))
+
+    def test_multi_valued_attributes_and_pgtiou_are_kept(self):
+        user, attributes, pgtiou = parse_json_response(json.dumps(
+            {'serviceResponse': {'authenticationSuccess': {
+                'user': 'fake_uid',
+                'proxyGrantingTicket': 'PGTIOU-fake',
+                'attributes': {'groups': ['a', 'b'], 'email': ['x@qed.ai']},
+            }}}))
+        self.assertEqual(user, 'fake_uid')
+        self.assertEqual(
+            attributes, {'groups': ['a', 'b'], 'email': 'x@qed.ai'})
+        self.assertEqual(pgtiou, 'PGTIOU-fake')
+
+    def test_malformed_response_raises(self):
+        with self.assertRaises(TicketValidationError):
+            parse_json_response(b'<html>Bad gateway</html>')
+
+
+@override_settings(
+    CAS_SERVER_URL='https://fake-cas.qed.ai/',
+    CAS_BINDER_JSON_TICKET_VALIDATION=True)
+class TestJsonTicketValidation(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='fake_username', email='fake_email@qed.ai')
+        CASUser.objects.create(user=self.user, universal_id='fake_uid')
+
+    @responses.activate
+    def test_backend_validates_tickets_with_json(self):
+        responses.add(
+            responses.GET, 'https://fake-cas.qed.ai/p3/serviceValidate',
+            body=success_json('fake_uid', 'fake_username'))
+
+        user = CASBinderBackend().authenticate(
+            'fake_ticket', 'https://fake-service.qed.ai/')
+
+        self.assertEqual(user, self.user)
+        request = responses.calls[0].request
+        self.assertEqual(request.params, {
+            'ticket': 'fake_ticket',
+            'service': 'https://fake-service.qed.ai/',
+            'format': 'JSON',
+        })
+
+    @override_settings(CAS_PROXY_CALLBACK='https://fake-service.qed.ai/pgt')
+    @responses.activate
+    def test_backend_requests_and_stores_proxy_granting_tickets(self):
+        class FakeRequest(object):
+            def __init__(self):
+                self.session = {}
+
+        responses.add(
+            responses.GET, 'https://fake-cas.qed.ai/p3/serviceValidate',
+            body=json.dumps({'serviceResponse': {'authenticationSuccess': {
+                'user': 'fake_uid',
+                'proxyGrantingTicket': 'PGTIOU-fake',
+                'attributes': {'username': ['fake_username']},
+            }}}))
+        request = FakeRequest()
+
+        CASBinderBackend().authenticate(
+            'fake_ticket', 'https://fake-service.qed.ai/', request)
+
+        self.assertEqual(
+            responses.calls[0].request.params['pgtUrl'],
+            'https://fake-service.qed.ai/pgt')
+        self.assertEqual(request.session['pgtiou'], 'PGTIOU-fake')
+
+    @responses.activate
+    def test_backend_rejects_invalid_tickets(self):
+        responses.add(
+            responses.GET, 'https://fake-cas.qed.ai/p3/serviceValidate',
+            body=FAILURE_JSON)
+
+        self.assertIsNone(CASBinderBackend().authenticate(
+            'fake_ticket', 'https://fake-service.qed.ai/'))
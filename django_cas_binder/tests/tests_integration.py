@@ -1,11 +1,21 @@
+import threading
+from unittest import mock
+
 import httmock
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.base import SessionBase
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_cas_ng.signals import cas_user_authenticated
 from httmock import HTTMock
 
 from django_cas_binder.auth_backends import CASBinderBackend
 from django_cas_binder.models import CASUser
+from django_cas_binder.session_index import UNIVERSAL_ID_ATTRIBUTE
+from django_cas_binder.signal_dispatch import get_signal_dispatcher
+from django_cas_binder.signals import cas_user_authenticated_sync
 
 
 class FakeCAS(object):
@@ -90,6 +100,56 @@ class TestCASBinderBackend__UserExists(TestCase):
             'fake_email@qed.ai',
         )
 
+    def test_auth_backend_should_mark_request_with_universal_id(self):
+        self.perform_auth()
+
+        self.assertEqual(
+            getattr(self.django_request, UNIVERSAL_ID_ATTRIBUTE),
+            'fake_universal_id',
+        )
+
+    @override_settings(CAS_BINDER_SESSION_ATTRIBUTES=['email'])
+    def test_auth_backend_should_store_only_selected_session_attributes(self):
+        self.perform_auth()
+
+        self.assertEqual(
+            self.django_request.session['attributes'],
+            {'email': 'fake_email@qed.ai'},
+        )
+
+    def test_auth_backend_should_store_raw_attributes_by_default(self):
+        attributes = {
+            'username': 'fake_username', 'email': '', 'groups': ['a']}
+        with mock.patch.object(
+                CASBinderBackend, 'verify_ticket',
+                return_value=('fake_universal_id', dict(attributes), None)):
+            self.perform_auth()
+
+        self.assertEqual(self.django_request.session['attributes'], attributes)
+
+    def test_auth_backend_should_not_modify_session_when_unchanged(self):
+        self.django_request.session = SessionBase()
+        self.perform_auth()
+        self.assertTrue(self.django_request.session.modified)
+
+        self.django_request.session.modified = False
+        self.perform_auth()
+        self.assertFalse(self.django_request.session.modified)
+
+    @override_settings(CAS_BINDER_UPDATE_USER_ATTRIBUTES=['username'])
+    def test_auth_backend_should_not_modify_session_when_username_cleaned(
+            self):
+        get_user_model().objects.create(username='fake_username', email='')
+        self.django_request.session = SessionBase()
+        self.perform_auth()
+        self.assertEqual(
+            self.django_request.session['attributes']['username'],
+            'fake_username')
+
+        self.django_request.session.modified = False
+        self.perform_auth()
+        self.assertFalse(self.django_request.session.modified)
+
     @override_settings(CAS_BINDER_UPDATE_USER_ATTRIBUTES=['username'])
     def test_auth_backend_should_update_username_when_requested(self):
         self.assertEqual(self.user.username, 'old_fake_username')
@@ -112,6 +172,68 @@ class TestCASBinderBackend__UserExists(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(self.user.email, 'fake_email@qed.ai')
 
+    @override_settings(
+        CAS_BINDER_UPDATE_USER_ATTRIBUTES=['email'],
+        CAS_BINDER_DEFERRED_ATTRIBUTE_UPDATES='on_commit')
+    def test_auth_backend_should_defer_attribute_updates_when_requested(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            authenticated_user = self.perform_auth()
+            self.user.refresh_from_db()
+            self.assertEqual(self.user.email, 'old_fake_email@qed.ai')
+        self.assertEqual(authenticated_user.email, 'fake_email@qed.ai')
+
+        for callback in callbacks:
+            callback()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'fake_email@qed.ai')
+
+    @override_settings(
+        CAS_BINDER_UPDATE_USER_ATTRIBUTES=['username', 'email'],
+        CAS_BINDER_UPDATE_ATTRIBUTES_ON_LOGIN=False)
+    def test_auth_backend_should_skip_updates_when_disabled_on_login(self):
+        self.perform_auth()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.username, 'old_fake_username')
+        self.assertEqual(self.user.email, 'old_fake_email@qed.ai')
+
+    @override_settings(CAS_BINDER_UPDATE_USER_ATTRIBUTES=['email'])
+    def test_auth_backend_should_not_save_unchanged_attributes(self):
+        self.user.email = 'fake_email@qed.ai'
+        self.user.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.perform_auth()
+
+        self.assertEqual(
+            [q['sql'] for q in queries if q['sql'].startswith('UPDATE')], [])
+
+    @override_settings(CAS_BINDER_ASYNC_SIGNAL_DISPATCH=True)
+    def test_auth_backend_should_dispatch_signal_asynchronously(self):
+        received = []
+
+        def receiver(sender, user, **kwargs):
+            received.append((user.pk, threading.current_thread()))
+        cas_user_authenticated.connect(receiver)
+        self.addCleanup(cas_user_authenticated.disconnect, receiver)
+        cas_user_authenticated_sync.connect(receiver)
+        self.addCleanup(cas_user_authenticated_sync.disconnect, receiver)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.perform_auth()
+        get_signal_dispatcher().join()
+        # not dispatched before the transaction commits
+        self.assertEqual(len(received), 1)
+
+        for callback in callbacks:
+            callback()
+        get_signal_dispatcher().join()
+
+        self.assertEqual(len(received), 2)
+        self.assertEqual(
+            received[0], (self.user.pk, threading.current_thread()))
+        self.assertEqual(received[1][0], self.user.pk)
+        self.assertIsNot(received[1][1], threading.current_thread())
+
     def test_auth_backend_should_not_update_user_attributes_by_default(self):
         self.assertEqual(self.user.username, 'old_fake_username')
         self.assertEqual(self.user.email, 'old_fake_email@qed.ai')
@@ -0,0 +1,106 @@
+"""Token bucket admission control for access token authentication.
+
+Attempts are throttled before CAS is called, keyed by client IP or by a hash
+of the access token. Bucket state lives in process memory or, to share
+it between processes, in a Django cache. Disabled unless
+CAS_BINDER_TOKEN_AUTH_RATE is set.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Parse a DRF style rate such as '60/min' into (requests, seconds)."""
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+def refill(state, now, capacity, rate):
+    """Return the number of tokens in a bucket given its stored state."""
+    if state is None:
+        return float(capacity)
+    tokens, updated = state
+    return min(float(capacity), tokens + (now - updated) * rate)
+
+
+class LocalTokenBucketStore(object):
+    """Buckets kept in process memory. At most `max_keys` buckets are kept;
+    the least recently used ones are dropped (i.e. refilled) first.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self.lock:
+            tokens = refill(self.buckets.pop(key, None), now, capacity, rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return allowed, tokens
+
+
+class CacheTokenBucketStore(object):
+    """Buckets kept in a Django cache, shared between processes. Updates are
+    not atomic, so concurrent attempts may occasionally be let through a
+    nearly empty bucket.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, rate, now):
+        key = 'cas_binder:token_auth_throttle:' + key
+        tokens = refill(self.cache.get(key), now, capacity, rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.cache.set(key, (tokens, now), int(capacity / rate) + 1)
+        return allowed, tokens
+
+
+_local_store = LocalTokenBucketStore()
+
+
+def get_throttle_key(request, access_token):
+    if getattr(settings, 'CAS_BINDER_TOKEN_AUTH_THROTTLE_KEY', 'ip') == \
+            'token':
+        # the whole token: tokens of a kind (e.g. JWTs) share long prefixes
+        return 'token:' + hashlib.sha256(
+            access_token.encode('utf-8')).hexdigest()
+    return 'ip:' + BaseThrottle().get_ident(request)
+
+
+def allow_token_auth_attempt(request, access_token, now=None):
+    """Take a token from the caller's bucket. Return (allowed, wait) where
+    wait is the number of seconds until the next attempt would be allowed.
+    """
+    rate = getattr(settings, 'CAS_BINDER_TOKEN_AUTH_RATE', None)
+    if rate is None:
+        return True, None
+    num, duration = parse_rate(rate)
+    capacity = getattr(settings, 'CAS_BINDER_TOKEN_AUTH_BURST', None) or num
+    per_second = float(num) / duration
+
+    alias = getattr(settings, 'CAS_BINDER_TOKEN_AUTH_THROTTLE_CACHE', None)
+    store = _local_store if alias is None else CacheTokenBucketStore(alias)
+    allowed, tokens = store.take(
+        get_throttle_key(request, access_token), capacity, per_second,
+        time.time() if now is None else now)
+    if allowed:
+        return True, None
+    return False, (1 - tokens) / per_second
@@ -0,0 +1,70 @@
+"""CAS 3 ticket validation with JSON responses.
+
+With CAS_BINDER_JSON_TICKET_VALIDATION enabled, CASBinderBackend validates
+tickets by requesting `p3/serviceValidate?format=JSON` itself, over a
+requests session kept per thread (so connections to CAS are reused across
+logins), instead of going through a python-cas client, which opens a new
+connection and parses an XML response for every login.
+"""
+import json
+import threading
+
+from django.conf import settings
+
+
+class TicketValidationError(Exception):
+    pass
+
+
+_local = threading.local()
+
+
+def get_session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        # imported lazily, see auth_backends
+        import requests
+
+        session = _local.session = requests.Session()
+    return session
+
+
+def unwrap(value):
+    if isinstance(value, list) and len(value) == 1:
+        return value[0]
+    return value
+
+
+def parse_json_response(content):
+    """Parse a CAS 3 JSON serviceResponse into (user, attributes, pgtiou),
+    like python-cas does for XML: multi-valued attributes are lists, others
+    plain values, and a failed validation gives (None, {}, None).
+    """
+    try:
+        response = json.loads(content)['serviceResponse']
+    except (ValueError, KeyError, TypeError):
+        raise TicketValidationError(
+            'CAS returned: %r' % content[:50])
+    success = response.get('authenticationSuccess')
+    if not success:
+        return None, {}, None
+    attributes = dict(
+        (name, unwrap(value))
+        for name, value in (success.get('attributes') or {}).items())
+    return (
+        success.get('user'), attributes, success.get('proxyGrantingTicket'))
+
+
+def verify_ticket_json(server_url, ticket, service):
+    params = {'ticket': ticket, 'service': service, 'format': 'JSON'}
+    # like python-cas, ask for a proxy granting ticket if proxying is set up
+    proxy_callback = getattr(settings, 'CAS_PROXY_CALLBACK', None)
+    if proxy_callback:
+        params['pgtUrl'] = proxy_callback
+    r = get_session().get(
+        server_url + 'p3/serviceValidate',
+        params=params,
+        verify=getattr(settings, 'CAS_VERIFY_SSL_CERTIFICATE', True),
+        timeout=getattr(
+            settings, 'CAS_BINDER_TICKET_VALIDATION_TIMEOUT', 10.0))
+    return parse_json_response(r.content)
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from django_cas_binder import views
+
+
+urlpatterns = [
+    path('attributes/sync/', views.sync_attributes,
+         name='cas_binder_sync_attributes'),
+]
@@ -1,3 +1,6 @@
+import json
+
+
 def get_free_username(original, is_free, limit):
     if is_free(original):
         return original
@@ -9,3 +12,34 @@ def get_free_username(original, is_free, limit):
 
     raise Exception("Usernames {} and {}_{}-{} are taken".format(
         original, original, 2, limit - 1))
+
+
+def compact_attributes(attributes, names=None, max_size=None):
+    """Return a compact copy of CAS `attributes` suitable for the session.
+
+    Only attributes listed in `names` are kept (all of them if `names` is
+    None), in the order given by `names`. Empty values are dropped and
+    single-element lists are unwrapped. If `max_size` is given, attributes
+    are added in order for as long as their JSON encoding fits in
+    `max_size` bytes; the ones that don't fit are skipped.
+    """
+    if names is None:
+        names = sorted(attributes)
+    compacted = {}
+    size = 2  # the enclosing braces
+    for name in names:
+        value = attributes.get(name)
+        if isinstance(value, (list, tuple)) and len(value) == 1:
+            value = value[0]
+        if value is None or value == '' or value == []:
+            continue
+        if max_size is not None:
+            item_size = len(json.dumps(
+                {name: value}, separators=(',', ':')).encode('utf-8')) - 2
+            if compacted:
+                item_size += 1  # the separating comma
+            if size + item_size > max_size:
+                continue
+            size += item_size
+        compacted[name] = value
+    return compacted
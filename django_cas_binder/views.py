@@ -0,0 +1,64 @@
+import hashlib
+import hmac
+import json
+import time
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from django_cas_binder.attribute_sync import apply_attribute_changes
+
+
+def is_signature_valid(request, secret, tolerance):
+    """Check the X-CAS-Signature header, a hex HMAC-SHA256 (keyed with
+    `secret`) of the X-CAS-Timestamp header, a dot and the request body.
+    The timestamp must be within `tolerance` seconds of now."""
+    timestamp = request.META.get('HTTP_X_CAS_TIMESTAMP', '')
+    signature = request.META.get('HTTP_X_CAS_SIGNATURE', '')
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance:
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(
+        secret.encode('utf-8'),
+        timestamp.encode('utf-8') + b'.' + request.body,
+        hashlib.sha256,
+    ).hexdigest()
+    return hmac.compare_digest(
+        expected.encode('utf-8'), signature.encode('utf-8'))
+
+
+def is_valid_event(event):
+    version = event.get('version')
+    return isinstance(event.get('universal_id'), str) and \
+        isinstance(version, int) and not isinstance(version, bool) and \
+        isinstance(event.get('attributes'), dict)
+
+
+@csrf_exempt
+@require_POST
+def sync_attributes(request):
+    """Webhook through which CAS pushes batched attribute changes, as
+    {"events": [{"universal_id": ..., "version": ..., "attributes": {...}},
+    ...]}, see attribute_sync.apply_attribute_changes.
+    """
+    secret = getattr(settings, 'CAS_BINDER_WEBHOOK_SECRET', None)
+    if not secret:
+        raise Http404()
+    if not is_signature_valid(request, secret, getattr(
+            settings, 'CAS_BINDER_WEBHOOK_TOLERANCE', 300)):
+        return JsonResponse({'error': 'invalid signature'}, status=403)
+
+    try:
+        events = json.loads(request.body.decode('utf-8'))['events']
+        if not all(is_valid_event(event) for event in events):
+            raise ValueError()
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'error': 'malformed events'}, status=400)
+
+    updated, unknown, stale = apply_attribute_changes(events)
+    return JsonResponse({'updated': updated, 'unknown': unknown,
+                         'stale': stale})
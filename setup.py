@@ -12,21 +12,22 @@ setup(
     author='Quantitative Engineering Design Inc.',
     author_email='',
     url='',
-    packages=['django_cas_binder', 'django_cas_binder.migrations'],
+    packages=[
+        'django_cas_binder',
+        'django_cas_binder.management',
+        'django_cas_binder.management.commands',
+        'django_cas_binder.migrations',
+    ],
     classifiers=[
         'Environment :: Web Environment',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: BSD License',
         'Operating System :: OS Independent',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3 :: Only',
         'Framework :: Django',
     ],
     install_requires=[
-        "django>=1.9.0", "djangorestframework", "oic", "django-cas-ng"
+        "django>=3.2", "djangorestframework", "oic", "django-cas-ng"
     ]
 )